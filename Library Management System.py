@@ -1,10 +1,333 @@
 import tkinter as tk
-from tkinter import ttk, colorchooser, font, messagebox, filedialog
+from tkinter import ttk, colorchooser, font, messagebox, filedialog, simpledialog
 import sqlite3
-import csv
-import pandas as pd
-from docx import Document
-from fpdf import FPDF
+from collections import OrderedDict
+from datetime import date
+from library_circulation import CirculationError, checkout, delete_transaction, return_book
+from library_repository import LibraryRepository, PAGE_SIZE, SORT_COLUMNS
+from library_worker import DatabaseWorker, JobCancelled
+
+# Đường dẫn file cơ sở dữ liệu và cấu hình lưu trữ (xem STORAGE_PROFILES trong library_repository)
+DB_PATH = 'library.db'
+STORAGE_PROFILE = 'tuned'
+
+# Các thao tác sửa liên tiếp trong khoảng thời gian này (ms) được commit chung một lần (0: commit từng thao tác)
+GROUP_COMMIT_MS = 20
+
+# Số trang dữ liệu được giữ trong bộ nhớ đệm của mỗi TreeView
+CACHED_PAGES = 8
+
+# Chu kỳ (ms) quét các khoản mượn quá hạn trên luồng nền
+OVERDUE_SCAN_MS = 60000
+
+# Thời gian chờ (ms) sau lần gõ phím cuối cùng trước khi tìm kiếm
+SEARCH_DELAY_MS = 250
+
+# Cài đặt giao diện mặc định (font_style rỗng: giữ phông chữ mặc định của hệ thống)
+DEFAULT_SETTINGS = {"bg_color": "#FFFFFF", "font_size": "10", "font_style": ""}
+
+# Các phông chữ có tên của Tk mà mọi widget đang dùng, đổi phông chỉ cần cấu hình lại các phông này
+THEMED_FONTS = ("TkDefaultFont", "TkTextFont", "TkHeadingFont", "TkMenuFont", "TkCaptionFont")
+
+
+# Tỉ lệ sách đang được mượn: 1 - còn lại / tổng số bản
+def utilization(copies, available):
+    if not copies:
+        return "-"
+    return f"{1 - available / copies:.1%}"
+
+
+# Mô hình của một Treeview: ánh xạ khoá (rowid, cũng là iid) -> giá trị đang hiển thị của từng dòng
+# Khi dữ liệu thay đổi chỉ những dòng được thêm, sửa hoặc xoá mới được cập nhật trên Treeview
+class TreeModel:
+    def __init__(self, tree):
+        self.tree = tree
+        self.items = {}
+
+    # Đồng bộ Treeview với danh sách dòng mới (mỗi dòng bắt đầu bằng khoá), trả về (thêm, sửa, xoá)
+    # tags: ánh xạ khoá -> các tag của dòng (ví dụ để tô màu)
+    def apply(self, rows, tags=None):
+        tags = tags or {}
+        new_items = {str(row[0]): (tuple(row[1:]), tags.get(row[0], ())) for row in rows}
+        removed = [iid for iid in self.items if iid not in new_items]
+        # Xoá tất cả các dòng không còn hiển thị trong một lần gọi
+        if removed:
+            self.tree.delete(*removed)
+        inserted = updated = 0
+        for index, (iid, item) in enumerate(new_items.items()):
+            old_item = self.items.get(iid)
+            values, row_tags = item
+            if old_item is None:
+                self.tree.insert("", index, iid=iid, values=values, tags=row_tags)
+                inserted += 1
+                continue
+            if old_item != item:
+                self.tree.item(iid, values=values, tags=row_tags)
+                updated += 1
+            if self.tree.index(iid) != index:
+                self.tree.move(iid, "", index)
+        self.items = new_items
+        return inserted, updated, len(removed)
+
+
+# TreeView ảo: chỉ giữ các dòng đang hiển thị trong Treeview,
+# các trang dữ liệu được nạp từ SQLite theo khoá (keyset pagination) khi cuộn
+# Ô tìm kiếm phía trên lọc bảng bằng chỉ mục toàn văn khi người dùng gõ; truy vấn tìm kiếm chạy trên
+# luồng cơ sở dữ liệu (worker) vì từ khoá phổ biến phải chấm điểm rất nhiều dòng
+# Bấm vào tiêu đề cột để sắp xếp (tăng dần, giảm dần, bỏ sắp xếp), bấm chuột phải để lọc theo cột;
+# việc sắp xếp và lọc đều do SQLite thực hiện trên chỉ mục của cột
+# row_tags(rows): trả về tag của các dòng đang hiển thị (khoá -> tags), được gọi mỗi lần vẽ lại
+class VirtualTreeView:
+    def __init__(self, parent, columns, repo, worker, table, page_size=PAGE_SIZE, row_tags=None):
+        self.repo = repo
+        self.worker = worker
+        self.table = table
+        self.page_size = page_size
+        self.row_tags = row_tags
+        search_frame = ttk.Frame(parent)
+        search_frame.pack(pady=(20, 0))
+        ttk.Label(search_frame, text="Search").pack(side=tk.LEFT, padx=5)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        ttk.Entry(search_frame, textvariable=self.search_var, width=40).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Clear", command=lambda: self.search_var.set("")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Clear Filters", command=self.clear_filters).pack(side=tk.LEFT, padx=5)
+        tree_frame = ttk.Frame(parent)
+        tree_frame.pack(pady=(10, 20))
+        self.scrollbar = ttk.Scrollbar(tree_frame, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.tree.pack()
+        # Tiêu đề cột -> tên cột trong cơ sở dữ liệu (chỉ các cột có thể sắp xếp/lọc)
+        self.headings = {col: name for col, name in zip(columns, repo.table_spec(table)[1])
+                         if name in SORT_COLUMNS[table]}
+        for col in columns:
+            self.tree.heading(col, text=col)
+            if col in self.headings:
+                self.tree.heading(col, command=lambda col=col: self.toggle_sort(col))
+            self.tree.column(col, width=150)
+        self.tree.bind("<Button-3>", self.on_right_click)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_by(-3 if event.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Down>", lambda event: self.on_arrow_key(1))
+        self.tree.bind("<Up>", lambda event: self.on_arrow_key(-1))
+        self.model = TreeModel(self.tree)
+        self.visible_rows = int(self.tree.cget("height"))
+        self.offset = 0
+        self.total = 0
+        self.pages = OrderedDict()
+        # Khoá của dòng đứng ngay trước mỗi trang (trang 0 bắt đầu từ đầu bảng)
+        self.page_starts = {0: None}
+        # Sắp xếp hiện tại: (tiêu đề cột, giảm dần) hoặc None; bộ lọc: tiêu đề cột -> chuỗi lọc
+        self.order = None
+        self.filters = {}
+        # Kết quả tìm kiếm đang hiển thị (None: hiển thị toàn bộ bảng)
+        self.results = None
+        self.search_after_id = None
+        # Số thứ tự của lần đọc mới nhất, kết quả tìm kiếm của các lần trước đó bị bỏ qua
+        self.query_serial = 0
+
+    # Đọc lại số dòng và nạp lại cửa sổ đang hiển thị (sau khi dữ liệu thay đổi)
+    # Khi đang tìm kiếm thì chạy lại truy vấn tìm kiếm trên luồng cơ sở dữ liệu, các dòng cũ
+    # vẫn được hiển thị cho tới khi có kết quả
+    def refresh(self):
+        text = self.search_var.get().strip()
+        self.query_serial += 1
+        serial = self.query_serial
+        if text:
+            order, filters = self.query_order(), self.query_filters()
+            self.worker.submit(lambda repo, job: repo.search(self.table, text, order=order, filters=filters),
+                               on_done=lambda results: self.show_results(serial, results),
+                               on_error=lambda error: self.query_failed(serial, error))
+            return
+        self.results = None
+        try:
+            self.total = self.repo.count(self.table, self.query_filters())
+        except ValueError as error:
+            self.query_failed(serial, error)
+            return
+        self.reload()
+
+    def show_results(self, serial, results):
+        if serial != self.query_serial:
+            return
+        self.results = results
+        self.total = len(results)
+        self.reload()
+
+    # Bộ lọc không hợp lệ (ví dụ chữ trong cột số): bỏ bộ lọc đó và đọc lại
+    def query_failed(self, serial, error):
+        if serial != self.query_serial:
+            return
+        if not isinstance(error, ValueError):
+            messagebox.showerror("Error", str(error))
+            return
+        messagebox.showwarning("Warning", str(error))
+        self.filters.clear()
+        self.update_headings()
+        self.refresh()
+
+    # Bỏ các trang đã nạp và vẽ lại từ số dòng mới
+    def reload(self):
+        self.pages.clear()
+        self.page_starts = {0: None}
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        self.render()
+
+    # Lấy một trang: ưu tiên bộ nhớ đệm, sau đó keyset theo khoá của dòng cuối trang trước
+    def fetch_page(self, page):
+        if self.results is not None:
+            return self.results[page * self.page_size:(page + 1) * self.page_size]
+        if page in self.pages:
+            self.pages.move_to_end(page)
+            return self.pages[page]
+        if page in self.page_starts:
+            after = self.page_starts[page]
+        else:
+            after = self.repo.key_before(self.table, page * self.page_size, self.query_order(),
+                                         self.query_filters())
+        rows, last_key = self.repo.view_page(self.table, after, self.page_size, self.query_order(),
+                                             self.query_filters())
+        self.pages[page] = rows
+        if len(self.pages) > CACHED_PAGES:
+            self.pages.popitem(last=False)
+        if rows:
+            self.page_starts[page + 1] = last_key
+        return rows
+
+    # Sắp xếp và bộ lọc theo tên cột trong cơ sở dữ liệu
+    def query_order(self):
+        if self.order is None:
+            return None
+        col, descending = self.order
+        return self.headings[col], descending
+
+    def query_filters(self):
+        return {self.headings[col]: text for col, text in self.filters.items()}
+
+    # Bấm tiêu đề cột: tăng dần -> giảm dần -> bỏ sắp xếp
+    def toggle_sort(self, col):
+        if self.order is None or self.order[0] != col:
+            self.order = (col, False)
+        elif not self.order[1]:
+            self.order = (col, True)
+        else:
+            self.order = None
+        self.update_headings()
+        self.offset = 0
+        self.refresh()
+
+    # Bấm chuột phải vào tiêu đề cột: nhập bộ lọc cho cột đó (để trống để bỏ lọc)
+    def on_right_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "heading":
+            return None
+        col = self.tree["columns"][int(self.tree.identify_column(event.x)[1:]) - 1]
+        if col not in self.headings:
+            return None
+        text = simpledialog.askstring(
+            "Filter", f"Filter {col} (text: starts with; numbers and dates: =, <, >, <=, >= or <>):",
+            initialvalue=self.filters.get(col, ""), parent=self.tree)
+        if text is None:
+            return "break"
+        if text.strip():
+            self.filters[col] = text.strip()
+        else:
+            self.filters.pop(col, None)
+        self.update_headings()
+        self.offset = 0
+        self.refresh()
+        return "break"
+
+    def clear_filters(self):
+        if self.filters:
+            self.filters.clear()
+            self.update_headings()
+            self.offset = 0
+            self.refresh()
+
+    # Hiển thị chiều sắp xếp và bộ lọc trên tiêu đề cột
+    def update_headings(self):
+        for col in self.headings:
+            text = col
+            if self.order and self.order[0] == col:
+                text += " \u25bc" if self.order[1] else " \u25b2"
+            if col in self.filters:
+                text += f" [{self.filters[col]}]"
+            self.tree.heading(col, text=text)
+
+    # Các dòng nằm trong cửa sổ hiển thị hiện tại
+    def window_rows(self):
+        first_page = self.offset // self.page_size
+        last_page = (self.offset + self.visible_rows - 1) // self.page_size
+        rows = []
+        for page in range(first_page, last_page + 1):
+            rows.extend(self.fetch_page(page))
+        start = self.offset - first_page * self.page_size
+        return rows[start:start + self.visible_rows]
+
+    # Nạp trước trang liền trước và liền sau cửa sổ hiển thị
+    def prefetch(self):
+        if self.results is not None:
+            return
+        first_page = self.offset // self.page_size
+        last_page = (self.offset + self.visible_rows - 1) // self.page_size
+        for page in (last_page + 1, first_page - 1):
+            if 0 <= page * self.page_size < self.total and page not in self.pages:
+                self.fetch_page(page)
+
+    # Vẽ lại cửa sổ hiển thị: chỉ các dòng thay đổi được cập nhật,
+    # các dòng còn lại (và trạng thái chọn của chúng) được giữ nguyên
+    def render(self):
+        rows = self.window_rows()
+        self.model.apply(rows, self.row_tags(rows) if self.row_tags and rows else None)
+        if self.total > self.visible_rows:
+            self.scrollbar.set(self.offset / self.total, (self.offset + self.visible_rows) / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.tree.after_idle(self.prefetch)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.total - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    # Xử lý lệnh từ thanh cuộn: ("moveto", fraction) hoặc ("scroll", n, "units"/"pages")
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * self.total))
+        elif unit == "pages":
+            self.scroll_by(int(value) * self.visible_rows)
+        else:
+            self.scroll_by(int(value))
+
+    # Tìm kiếm khi người dùng ngừng gõ SEARCH_DELAY_MS mili giây (debounce)
+    def on_search_changed(self, *args):
+        if self.search_after_id:
+            self.tree.after_cancel(self.search_after_id)
+        self.search_after_id = self.tree.after(SEARCH_DELAY_MS, self.apply_search)
+
+    def apply_search(self):
+        self.search_after_id = None
+        self.offset = 0
+        self.refresh()
+
+    # Phím mũi tên ở dòng đầu/cuối cửa sổ thì cuộn thêm một dòng
+    def on_arrow_key(self, step):
+        children = self.tree.get_children()
+        if not children or self.tree.focus() != children[-1 if step > 0 else 0]:
+            return None
+        self.scroll_by(step)
+        children = self.tree.get_children()
+        edge = children[-1 if step > 0 else 0]
+        self.tree.focus(edge)
+        self.tree.selection_set(edge)
+        return "break"
 
 
 class LibraryManagementSystem:
@@ -13,22 +336,37 @@ class LibraryManagementSystem:
         self.root.title("Library Management System")
         self.root.geometry("900x700")
 
-        # Kết nối tới cơ sở dữ liệu SQLite
-        self.conn = sqlite3.connect('library.db')
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+        # Kết nối tới cơ sở dữ liệu SQLite (mọi thao tác SQL đi qua LibraryRepository)
+        # Kết nối này chỉ dùng để đọc các trang hiển thị trên luồng giao diện
+        self.repo = LibraryRepository.open(DB_PATH, STORAGE_PROFILE)
+        # Luồng nền thực hiện mọi thao tác ghi, nhập và xuất dữ liệu
+        self.db_worker = DatabaseWorker(DB_PATH, self.root.after, profile=STORAGE_PROFILE,
+                                        group_commit_ms=GROUP_COMMIT_MS)
+        self.current_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Cài đặt giao diện đã lưu được áp dụng một lần trước khi tạo các widget
+        self.style = ttk.Style(self.root)
+        self.default_font_family = font.nametofont("TkDefaultFont").actual("family")
+        self.settings = dict(DEFAULT_SETTINGS, **self.repo.load_settings())
+        self.apply_theme(self.settings)
+        self.bg_color_var = tk.StringVar(value=self.settings["bg_color"])
+        self.font_size_var = tk.IntVar(value=int(self.settings["font_size"]))
+        self.font_style_var = tk.StringVar(value=self.settings["font_style"])
+        self.overdue_count = None
 
         self.create_toolbar()
         self.create_notebook()
         self.create_tabs()
+        self.scan_overdue()
 
     def create_toolbar(self):
         # Tạo thanh công cụ và thêm nút File với menu con
-        toolbar = tk.Frame(self.root, bd=1, relief=tk.RAISED)
+        toolbar = ttk.Frame(self.root, borderwidth=1, relief=tk.RAISED)
         toolbar.pack(side=tk.TOP, fill=tk.X)
 
         # Nút File với menu con (gồm các nút Save As, Reset All, và Import)
-        file_button = tk.Menubutton(toolbar, text="File", relief=tk.RAISED)
+        file_button = ttk.Menubutton(toolbar, text="File")
         file_button.pack(side=tk.LEFT, padx=2, pady=2)
         file_menu = tk.Menu(file_button, tearoff=0)
         file_menu.add_command(label="Save As", command=self.open_save_as_window)
@@ -36,88 +374,195 @@ class LibraryManagementSystem:
         file_menu.add_command(label="Import", command=self.import_data)
         file_button.config(menu=file_menu)
 
+        # Thanh tiến độ và nút huỷ cho các tác vụ chạy nền
+        self.cancel_button = ttk.Button(toolbar, text="Cancel", state=tk.DISABLED, command=self.cancel_job)
+        self.cancel_button.pack(side=tk.RIGHT, padx=2, pady=2)
+        self.progress_bar = ttk.Progressbar(toolbar, length=200, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=2, pady=2)
+        self.progress_label = ttk.Label(toolbar, text="")
+        self.progress_label.pack(side=tk.RIGHT, padx=2, pady=2)
+
+    # Đóng ứng dụng: huỷ tác vụ dài đang chạy (nhập/xuất), chờ luồng nền ghi xong rồi mới đóng cửa sổ
+    def close(self):
+        self.cancel_job()
+        self.db_worker.close()
+        self.repo.close()
+        self.root.destroy()
+
+    # Chạy một thao tác ngắn trên luồng cơ sở dữ liệu, callback được gọi lại trên luồng giao diện
+    # Các thao tác ngắn liên tiếp có thể được commit chung (group commit)
+    def run_db(self, func, *args, on_done=None, integrity_message=None):
+        def on_error(error):
+            if integrity_message and isinstance(error, sqlite3.IntegrityError):
+                messagebox.showwarning("Warning", integrity_message)
+            elif isinstance(error, CirculationError):
+                messagebox.showwarning("Warning", str(error))
+            else:
+                messagebox.showerror("Error", str(error))
+        return self.db_worker.submit(func, *args, on_done=on_done, on_error=on_error, group=True)
+
+    # Tạo callback làm mới TreeView (xoá các ô nhập, hiển thị thông báo) sau khi ghi xong
+    # extra_views: các TreeView khác cũng bị thay đổi bởi thao tác này
+    def after_write(self, view, clear_fields=None, info=None, extra_views=()):
+        def on_done(result):
+            # Tab chưa được mở thì chưa có TreeView, dữ liệu mới sẽ được đọc khi mở tab
+            for each_view in (view, *extra_views):
+                if each_view:
+                    each_view.refresh()
+            if clear_fields:
+                clear_fields()
+            if info:
+                messagebox.showinfo(*info)
+        return on_done
+
+    # Chạy tác vụ dài trên luồng nền, hiển thị tiến độ và cho phép huỷ
+    def run_in_background(self, label, func, *args, on_done=None, on_error=None):
+        if self.current_job:
+            messagebox.showwarning("Warning", "Another operation is still running, please wait!")
+            return None
+
+        def finish(callback, value):
+            self.current_job = None
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=0)
+            self.progress_label.config(text="")
+            self.cancel_button.config(state=tk.DISABLED)
+            if isinstance(value, JobCancelled):
+                messagebox.showinfo(label, "Operation cancelled")
+            elif callback:
+                callback(value)
+            elif isinstance(value, Exception):
+                messagebox.showerror("Error", str(value))
+
+        def on_progress(done, total):
+            if total:
+                self.progress_bar.stop()
+                self.progress_bar.config(mode="determinate", maximum=total, value=done)
+                self.progress_label.config(text=f"{label} {done:,}/{total:,}")
+            else:
+                self.progress_label.config(text=f"{label} {done:,} rows")
+
+        self.progress_label.config(text=label)
+        self.progress_bar.config(mode="indeterminate")
+        self.progress_bar.start()
+        self.cancel_button.config(state=tk.NORMAL)
+        self.current_job = self.db_worker.submit(func, *args,
+                                                 on_done=lambda result: finish(on_done, result),
+                                                 on_error=lambda error: finish(on_error, error),
+                                                 on_progress=on_progress)
+        return self.current_job
+
+    # Huỷ tác vụ đang chạy nền (dừng ở khối dữ liệu kế tiếp, thay đổi được rollback)
+    def cancel_job(self):
+        if self.current_job:
+            self.current_job.cancel()
+
     # Thao tác trong cơ sở dữ liệu
     def create_notebook(self):
         # Tạo notebook (giao diện tab)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(pady=10, expand=True)
 
-    # Tạo bảng trong cơ sở dữ liệu
-    def create_tables(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS books (
-                title TEXT PRIMARY KEY,
-                author TEXT,
-                genre TEXT,
-                quantity INTEGER,
-                available INTEGER
-            )
-        ''')
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS members (
-                    member_id TEXT PRIMARY KEY,
-                    name TEXT,
-                    membership_date TEXT,
-                    books_borrowed TEXT,
-                    quantity_borrowed INTEGER
-                )
-            ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id TEXT PRIMARY KEY,
-                book_id TEXT,
-                member_id TEXT,
-                borrow_date TEXT,
-                return_date TEXT
-            )
-        ''')
-        self.conn.commit()
+    # Các tab chỉ được dựng (widget và dữ liệu) khi được chọn lần đầu để cửa sổ hiện ra nhanh
     def create_tabs(self):
         # Setup các tabs
         self.books_tab = ttk.Frame(self.notebook, width=800, height=600)
         self.members_tab = ttk.Frame(self.notebook, width=800, height=600)
         self.transactions_tab = ttk.Frame(self.notebook, width=800, height=600)
+        self.statistics_tab = ttk.Frame(self.notebook, width=800, height=600)
         self.settings_tab = ttk.Frame(self.notebook, width=800, height=600)
 
         self.notebook.add(self.books_tab, text="Books")
         self.notebook.add(self.members_tab, text="Members")
         self.notebook.add(self.transactions_tab, text="Transactions")
+        self.notebook.add(self.statistics_tab, text="Statistics")
         self.notebook.add(self.settings_tab, text="Settings")
 
-        self.setup_books_tab()
-        self.setup_members_tab()
-        self.setup_transactions_tab()
-        self.setup_settings_tab()
+        self.books_view = self.members_view = self.transactions_view = None
+        self.tab_builders = {
+            str(self.books_tab): self.setup_books_tab,
+            str(self.members_tab): self.setup_members_tab,
+            str(self.transactions_tab): self.setup_transactions_tab,
+            str(self.statistics_tab): self.setup_statistics_tab,
+            str(self.settings_tab): self.setup_settings_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed, add="+")
+        self.build_tab(self.notebook.select())
+
+    # Dựng tab nếu chưa được dựng
+    def build_tab(self, tab):
+        builder = self.tab_builders.pop(str(tab), None)
+        if builder:
+            builder()
 
     def setup_books_tab(self):
         # Setup thông tin tab Books
-        self.books_tree = self.create_tree_view(self.books_tab, ["Title", "Author", "Genre", "Quantity", "Available"])
+        self.books_view = self.create_tree_view(self.books_tab, ["Title", "Author", "Genre", "Quantity", "Available"],
+                                                "books")
+        self.books_tree = self.books_view.tree
         self.create_book_form(self.books_tab)
         self.load_books()
-        tk.Button(self.books_tab, text="Reset Books", command=self.reset_books).pack(pady=10)
+        ttk.Button(self.books_tab, text="Reset Books", command=self.reset_books).pack(pady=10)
 
     def setup_members_tab(self):
         # Setup thông tin tab Members
-        self.members_tree = self.create_tree_view(self.members_tab,
+        self.members_view = self.create_tree_view(self.members_tab,
                                                   ["Member ID", "Name", "Membership Date", "Books Borrowed",
-                                                   "Quantity Borrowed"])
+                                                   "Quantity Borrowed"], "members")
+        self.members_tree = self.members_view.tree
         self.create_member_form(self.members_tab)
         self.load_members()
-        tk.Button(self.members_tab, text="Reset Members", command=self.reset_members).pack(pady=10)
+        ttk.Button(self.members_tab, text="Reset Members", command=self.reset_members).pack(pady=10)
 
     def setup_transactions_tab(self):
         # Setup thông tin tab Transactions
-        self.transactions_tree = self.create_tree_view(self.transactions_tab,
+        self.transactions_view = self.create_tree_view(self.transactions_tab,
                                                        ["Transaction ID", "Book ID", "Member ID", "Borrow Date",
-                                                        "Return Date"])
+                                                        "Return Date"], "transactions", row_tags=self.overdue_tags)
+        self.transactions_tree = self.transactions_view.tree
+        self.transactions_tree.tag_configure("overdue", background="#FFD6D6")
         self.create_transaction_form(self.transactions_tab)
+        overdue_frame = ttk.Frame(self.transactions_tab)
+        overdue_frame.pack()
+        self.overdue_label = ttk.Label(overdue_frame, text="")
+        self.overdue_label.pack(side=tk.LEFT, padx=10)
+        self.show_overdue_count()
+        ttk.Button(overdue_frame, text="Overdue Report", command=self.show_overdue_report).pack(side=tk.LEFT, padx=10)
         self.load_transactions()
-        tk.Button(self.transactions_tab, text="Reset Transactions", command=self.reset_transactions).pack(pady=10)
+        ttk.Button(self.transactions_tab, text="Reset Transactions", command=self.reset_transactions).pack(pady=10)
+
+    def setup_statistics_tab(self):
+        # Setup thông tin tab Statistics (số liệu được làm mới mỗi khi mở tab)
+        self.totals_label = ttk.Label(self.statistics_tab, text="", justify=tk.LEFT)
+        self.totals_label.pack(pady=10)
+        ttk.Label(self.statistics_tab, text="Loans per Genre").pack()
+        self.genre_stats_tree = ttk.Treeview(self.statistics_tab, show="headings", height=8,
+                                             columns=["Genre", "Titles", "Copies", "Available", "Utilization",
+                                                      "Loans"])
+        for col in self.genre_stats_tree["columns"]:
+            self.genre_stats_tree.heading(col, text=col)
+            self.genre_stats_tree.column(col, width=120)
+        self.genre_stats_tree.pack(pady=5)
+        ttk.Label(self.statistics_tab, text="Top Borrowed Titles").pack()
+        self.top_titles_tree = ttk.Treeview(self.statistics_tab, columns=["Title", "Loans"], show="headings",
+                                            height=10)
+        self.top_titles_tree.heading("Title", text="Title")
+        self.top_titles_tree.column("Title", width=400)
+        self.top_titles_tree.heading("Loans", text="Loans")
+        self.top_titles_tree.column("Loans", width=120)
+        self.top_titles_tree.pack(pady=5)
+        ttk.Button(self.statistics_tab, text="Refresh", command=self.load_statistics).pack(pady=10)
 
     def setup_settings_tab(self):
         # Setup thông tin tab Settings
         self.create_settings_form(self.settings_tab)
 
+    def on_tab_changed(self, event):
+        selected = self.notebook.select()
+        self.build_tab(selected)
+        if selected == str(self.statistics_tab):
+            self.load_statistics()
+
     # Tạo tính năng Reset All
     def reset_all(self):
         if messagebox.askyesno("Warning",
@@ -126,165 +571,152 @@ class LibraryManagementSystem:
             self.reset_members(confirm=False)
             self.reset_transactions(confirm=False)
             self.reset_settings(confirm=False)
-            messagebox.showinfo("Reset All", "Reset Successfully!")
+            # Hàng đợi chạy theo thứ tự nên thông báo hiển thị sau khi các bảng đã được xoá
+            self.run_db(lambda repo, job: None, on_done=lambda result: messagebox.showinfo("Reset All",
+                                                                                        "Reset Successfully!"))
 
     # Tạo tính năng reset dữ liệu sách
     def reset_books(self, confirm=True):
         if not confirm or messagebox.askyesno("Warning",
                                               "This action will delete all book's data. Do you want to proceed?"):
-            self.cursor.execute('DELETE FROM books')
-            self.conn.commit()
-            for item in self.books_tree.get_children():
-                self.books_tree.delete(item)
-            if confirm:
-                messagebox.showinfo("Books Data Reset", "Reset successfully!")
+            info = ("Books Data Reset", "Reset successfully!") if confirm else None
+            self.run_db(lambda repo, job: repo.reset("books"), on_done=self.after_write(self.books_view, info=info))
 
     # Tạo tính năng reset dữ liệu thành viên
     def reset_members(self, confirm=True):
         if not confirm or messagebox.askyesno("Warning",
                                               "This action will delete all member's data. Do you want to proceed?"):
-            self.cursor.execute('DELETE FROM members')
-            self.conn.commit()
-            for item in self.members_tree.get_children():
-                self.members_tree.delete(item)
-            if confirm:
-                messagebox.showinfo("Members Data Reset", "Reset successfully!")
+            info = ("Members Data Reset", "Reset successfully!") if confirm else None
+            self.run_db(lambda repo, job: repo.reset("members"), on_done=self.after_write(self.members_view, info=info))
 
     # Tạo tính năng reset dữ liệu giao dịch
     def reset_transactions(self, confirm=True):
         if not confirm or messagebox.askyesno("Warning",
                                               "This action will delete all transaction's data. Do you want to proceed?"):
-            self.cursor.execute('DELETE FROM transactions')
-            self.conn.commit()
-            for item in self.transactions_tree.get_children():
-                self.transactions_tree.delete(item)
-            if confirm:
-                messagebox.showinfo("Transactions Data Reset", "Reset successfully!")
+            info = ("Transactions Data Reset", "Reset successfully!") if confirm else None
+            self.run_db(lambda repo, job: repo.reset("transactions"), on_done=self.after_write(self.transactions_view, info=info))
 
     # Tạo tính năng reset cài đặt
     def reset_settings(self, confirm=True):
         if not confirm or messagebox.askyesno("Warning",
                                               "This action will reset all settings to default. Do you want to proceed?"):
-            self.bg_color_var.set('#FFFFFF')
-            self.font_size_var.set(10)
-            self.font_style_var.set('TkDefaultFont')
+            self.bg_color_var.set(DEFAULT_SETTINGS["bg_color"])
+            self.font_size_var.set(DEFAULT_SETTINGS["font_size"])
+            self.font_style_var.set(DEFAULT_SETTINGS["font_style"])
             print(
                 f"Reset settings to default: bg_color={self.bg_color_var.get()}, font_size={self.font_size_var.get()}, font_style={self.font_style_var.get()}")
             self.apply_settings()
             if confirm:
                 messagebox.showinfo("Settings Reset", "Settings reset successfully!")
 
-    # Tạo TreeView để hiển thị dữ liệu
-    def create_tree_view(self, parent, columns):
-        tree_frame = tk.Frame(parent)
-        tree_frame.pack(pady=20)
-        tree_scroll = tk.Scrollbar(tree_frame)
-        tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        tree = ttk.Treeview(tree_frame, yscrollcommand=tree_scroll.set, columns=columns, show="headings")
-        tree.pack()
-        tree_scroll.config(command=tree.yview)
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=150)
-        return tree
+    # Tạo TreeView (chế độ danh sách ảo) để hiển thị dữ liệu
+    def create_tree_view(self, parent, columns, table, row_tags=None):
+        return VirtualTreeView(parent, columns, self.repo, self.db_worker, table, row_tags=row_tags)
 
     # Thiết kết tab Books
     def create_book_form(self, parent):
-        form_frame = tk.Frame(parent)
+        form_frame = ttk.Frame(parent)
         form_frame.pack(pady=20)
-        tk.Label(form_frame, text="Title").grid(row=0, column=0, padx=10, pady=5)
-        self.title_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Title").grid(row=0, column=0, padx=10, pady=5)
+        self.title_entry = ttk.Entry(form_frame)
         self.title_entry.grid(row=0, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Author").grid(row=1, column=0, padx=10, pady=5)
-        self.author_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Author").grid(row=1, column=0, padx=10, pady=5)
+        self.author_entry = ttk.Entry(form_frame)
         self.author_entry.grid(row=1, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Genre").grid(row=2, column=0, padx=10, pady=5)
-        self.genre_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Genre").grid(row=2, column=0, padx=10, pady=5)
+        self.genre_entry = ttk.Entry(form_frame)
         self.genre_entry.grid(row=2, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Quantity").grid(row=3, column=0, padx=10, pady=5)
-        self.quantity_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Quantity").grid(row=3, column=0, padx=10, pady=5)
+        self.quantity_entry = ttk.Entry(form_frame)
         self.quantity_entry.grid(row=3, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Available").grid(row=4, column=0, padx=10, pady=5)
-        self.available_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Available").grid(row=4, column=0, padx=10, pady=5)
+        self.available_entry = ttk.Entry(form_frame)
         self.available_entry.grid(row=4, column=1, padx=10, pady=5)
-        tk.Button(form_frame, text="Add Book", command=self.add_book).grid(row=5, column=0, padx=10, pady=10)
-        tk.Button(form_frame, text="Update Book", command=self.update_book).grid(row=5, column=1, padx=10, pady=10)
-        tk.Button(form_frame, text="Delete Book", command=self.delete_book).grid(row=6, column=0, padx=10, pady=10)
-        tk.Button(form_frame, text="Clear Fields", command=self.clear_fields).grid(row=6, column=1, padx=10, pady=10)
+        ttk.Button(form_frame, text="Add Book", command=self.add_book).grid(row=5, column=0, padx=10, pady=10)
+        ttk.Button(form_frame, text="Update Book", command=self.update_book).grid(row=5, column=1, padx=10, pady=10)
+        ttk.Button(form_frame, text="Delete Book", command=self.delete_book).grid(row=6, column=0, padx=10, pady=10)
+        ttk.Button(form_frame, text="Clear Fields", command=self.clear_fields).grid(row=6, column=1, padx=10, pady=10)
 
     # Thiết kết tab Members
     def create_member_form(self, parent):
-        form_frame = tk.Frame(parent)
+        form_frame = ttk.Frame(parent)
         form_frame.pack(pady=20)
-        tk.Label(form_frame, text="Member ID").grid(row=0, column=0, padx=10, pady=5)
-        self.member_id_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Member ID").grid(row=0, column=0, padx=10, pady=5)
+        self.member_id_entry = ttk.Entry(form_frame)
         self.member_id_entry.grid(row=0, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Name").grid(row=1, column=0, padx=10, pady=5)
-        self.name_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Name").grid(row=1, column=0, padx=10, pady=5)
+        self.name_entry = ttk.Entry(form_frame)
         self.name_entry.grid(row=1, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Membership Date").grid(row=2, column=0, padx=10, pady=5)
-        self.membership_date_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Membership Date").grid(row=2, column=0, padx=10, pady=5)
+        self.membership_date_entry = ttk.Entry(form_frame)
         self.membership_date_entry.grid(row=2, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Books Borrowed").grid(row=3, column=0, padx=10, pady=5)
-        self.books_borrowed_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Books Borrowed").grid(row=3, column=0, padx=10, pady=5)
+        self.books_borrowed_entry = ttk.Entry(form_frame)
         self.books_borrowed_entry.grid(row=3, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Quantity Borrowed").grid(row=4, column=0, padx=10, pady=5)
-        self.quantity_borrowed_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Quantity Borrowed").grid(row=4, column=0, padx=10, pady=5)
+        self.quantity_borrowed_entry = ttk.Entry(form_frame)
         self.quantity_borrowed_entry.grid(row=4, column=1, padx=10, pady=5)
-        tk.Button(form_frame, text="Add Member", command=self.add_member).grid(row=5, column=0, padx=10, pady=10)
-        tk.Button(form_frame, text="Update Member", command=self.update_member).grid(row=5, column=1, padx=10, pady=10)
-        tk.Button(form_frame, text="Delete Member", command=self.delete_member).grid(row=6, column=0, padx=10, pady=10)
-        tk.Button(form_frame, text="Clear Fields", command=self.clear_member_fields).grid(row=6, column=1, padx=10,
+        ttk.Button(form_frame, text="Add Member", command=self.add_member).grid(row=5, column=0, padx=10, pady=10)
+        ttk.Button(form_frame, text="Update Member", command=self.update_member).grid(row=5, column=1, padx=10, pady=10)
+        ttk.Button(form_frame, text="Delete Member", command=self.delete_member).grid(row=6, column=0, padx=10, pady=10)
+        ttk.Button(form_frame, text="Clear Fields", command=self.clear_member_fields).grid(row=6, column=1, padx=10,
                                                                                           pady=10)
+        ttk.Button(form_frame, text="Show Loans", command=self.show_member_loans).grid(row=7, column=0, columnspan=2,
+                                                                                      padx=10, pady=10)
 
     # Thiết kế tab Transactions
     def create_transaction_form(self, parent):
-        form_frame = tk.Frame(parent)
+        form_frame = ttk.Frame(parent)
         form_frame.pack(pady=20)
-        tk.Label(form_frame, text="Transaction ID").grid(row=0, column=0, padx=10, pady=5)
-        self.transaction_id_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Transaction ID").grid(row=0, column=0, padx=10, pady=5)
+        self.transaction_id_entry = ttk.Entry(form_frame)
         self.transaction_id_entry.grid(row=0, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Book ID").grid(row=1, column=0, padx=10, pady=5)
-        self.trans_book_id_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Book ID").grid(row=1, column=0, padx=10, pady=5)
+        self.trans_book_id_entry = ttk.Entry(form_frame)
         self.trans_book_id_entry.grid(row=1, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Member ID").grid(row=2, column=0, padx=10, pady=5)
-        self.trans_member_id_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Member ID").grid(row=2, column=0, padx=10, pady=5)
+        self.trans_member_id_entry = ttk.Entry(form_frame)
         self.trans_member_id_entry.grid(row=2, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Borrow Date").grid(row=3, column=0, padx=10, pady=5)
-        self.borrow_date_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Borrow Date").grid(row=3, column=0, padx=10, pady=5)
+        self.borrow_date_entry = ttk.Entry(form_frame)
         self.borrow_date_entry.grid(row=3, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Return Date").grid(row=4, column=0, padx=10, pady=5)
-        self.return_date_entry = tk.Entry(form_frame)
+        ttk.Label(form_frame, text="Return Date").grid(row=4, column=0, padx=10, pady=5)
+        self.return_date_entry = ttk.Entry(form_frame)
         self.return_date_entry.grid(row=4, column=1, padx=10, pady=5)
-        tk.Button(form_frame, text="Add Transaction", command=self.add_transaction).grid(row=5, column=0, padx=10,
+        ttk.Button(form_frame, text="Add Transaction", command=self.add_transaction).grid(row=5, column=0, padx=10,
                                                                                          pady=10)
-        tk.Button(form_frame, text="Update Transaction", command=self.update_transaction).grid(row=5, column=1, padx=10,
+        ttk.Button(form_frame, text="Update Transaction", command=self.update_transaction).grid(row=5, column=1, padx=10,
                                                                                                pady=10)
-        tk.Button(form_frame, text="Delete Transaction", command=self.delete_transaction).grid(row=6, column=0, padx=10,
+        ttk.Button(form_frame, text="Delete Transaction", command=self.delete_transaction).grid(row=6, column=0, padx=10,
                                                                                                pady=10)
-        tk.Button(form_frame, text="Clear Fields", command=self.clear_transaction_fields).grid(row=6, column=1, padx=10,
+        ttk.Button(form_frame, text="Clear Fields", command=self.clear_transaction_fields).grid(row=6, column=1, padx=10,
                                                                                                pady=10)
+        ttk.Button(form_frame, text="Check Out Book", command=self.checkout_book).grid(row=7, column=0, padx=10, pady=10)
+        ttk.Button(form_frame, text="Return Book", command=self.return_borrowed_book).grid(row=7, column=1, padx=10, pady=10)
 
     # Thiết kế tab Settings
     def create_settings_form(self, parent):
-        form_frame = tk.Frame(parent)
+        form_frame = ttk.Frame(parent)
         form_frame.pack(pady=20)
-        tk.Label(form_frame, text="Background Color").grid(row=0, column=0, padx=10, pady=5)
-        self.bg_color_var = tk.StringVar()
-        self.bg_color_button = tk.Button(form_frame, text="Choose Color", command=self.choose_bg_color)
+        ttk.Label(form_frame, text="Background Color").grid(row=0, column=0, padx=10, pady=5)
+        self.bg_color_button = ttk.Button(form_frame, text="Choose Color", command=self.choose_bg_color)
         self.bg_color_button.grid(row=0, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Font Size").grid(row=1, column=0, padx=10, pady=5)
-        self.font_size_var = tk.IntVar(value=10)
-        self.font_size_spinbox = tk.Spinbox(form_frame, from_=8, to=20, textvariable=self.font_size_var)
+        ttk.Label(form_frame, text="Font Size").grid(row=1, column=0, padx=10, pady=5)
+        self.font_size_spinbox = ttk.Spinbox(form_frame, from_=8, to=20, textvariable=self.font_size_var)
         self.font_size_spinbox.grid(row=1, column=1, padx=10, pady=5)
-        tk.Label(form_frame, text="Font Style").grid(row=2, column=0, padx=10, pady=5)
-        self.font_style_var = tk.StringVar()
-        self.font_style_combobox = ttk.Combobox(form_frame, textvariable=self.font_style_var, values=font.families())
+        ttk.Label(form_frame, text="Font Style").grid(row=2, column=0, padx=10, pady=5)
+        # Danh sách phông chữ chỉ được đọc khi mở danh sách lần đầu (font.families() chậm khi máy có nhiều phông)
+        self.font_style_combobox = ttk.Combobox(form_frame, textvariable=self.font_style_var,
+                                                postcommand=self.load_font_families)
         self.font_style_combobox.grid(row=2, column=1, padx=10, pady=5)
-        tk.Button(form_frame, text="Apply", command=self.apply_settings).grid(row=3, column=0, columnspan=2, pady=10)
-        tk.Button(form_frame, text="Reset Settings", command=self.reset_settings).grid(row=4, column=0, columnspan=2,
+        ttk.Button(form_frame, text="Apply", command=self.apply_settings).grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Button(form_frame, text="Reset Settings", command=self.reset_settings).grid(row=4, column=0, columnspan=2,
                                                                                        pady=10)
 
+    def load_font_families(self):
+        if not self.font_style_combobox["values"]:
+            self.font_style_combobox["values"] = font.families()
+
     # Thiết kế các tính năng cho hệ thống
     # Màu nền và phông chữ
     def choose_bg_color(self):
@@ -292,41 +724,40 @@ class LibraryManagementSystem:
         if color:
             self.bg_color_var.set(color)
 
-    # Áp dụng các cài đặt
+    # Áp dụng các cài đặt và lưu vào cơ sở dữ liệu để lần mở sau dùng lại
     def apply_settings(self):
+        try:
+            font_size = self.font_size_var.get()
+        except tk.TclError:
+            messagebox.showerror("Error", "Font size must be a whole number")
+            return
+        self.settings = {"bg_color": self.bg_color_var.get(), "font_size": str(font_size),
+                         "font_style": self.font_style_var.get()}
+        self.apply_theme(self.settings)
+        settings = dict(self.settings)
+        self.run_db(lambda repo, job: repo.save_settings(settings))
+
+    # Mô tả function áp dụng cài đặt
+    # Chỉ cấu hình lại style ttk và các phông chữ có tên: mọi widget dùng chúng tự cập nhật,
+    # không phải duyệt và cấu hình lại từng widget
+    def apply_theme(self, settings):
         # Màu nền
-        bg_color = self.bg_color_var.get()
+        bg_color = settings["bg_color"]
         if bg_color:
-            self.apply_background_color(self.root, bg_color)
+            self.style.configure(".", background=bg_color)
+            self.style.configure("Treeview", fieldbackground=bg_color)
+            self.root.configure(bg=bg_color)
+            # Các cửa sổ con (Toplevel) tạo sau này lấy màu nền từ cơ sở dữ liệu tuỳ chọn của Tk
+            self.root.option_add("*Toplevel.background", bg_color)
 
         # Cỡ chữ và phông chữ
-        font_size = self.font_size_var.get()
-        font_style = self.font_style_var.get()
-        if font_style:
-            custom_font = font.Font(family=font_style, size=font_size)
-            self.apply_font(self.root, custom_font)
-
-    # Mô tả function áp dụng cài đặt
-    # Màu nền
-    def apply_background_color(self, widget, color):
-        # Liệt kê các widgets có hỗ trợ màu nền
-        supported_widgets = (tk.Frame, tk.Label, tk.Button, tk.Entry, ttk.Treeview, tk.Text)
-        if isinstance(widget, supported_widgets):
-            try:
-                widget.configure(bg=color)
-            except tk.TclError:
-                pass
-        for child in widget.winfo_children():
-            self.apply_background_color(child, color)
-
-    # Phông chữ
-    def apply_font(self, widget, custom_font):
-        try:
-            widget.configure(font=custom_font)
-        except tk.TclError:
-            pass
-        for child in widget.winfo_children():
-            self.apply_font(child, custom_font)
+        font_size = int(settings["font_size"])
+        family = settings["font_style"] or self.default_font_family
+        for name in THEMED_FONTS:
+            font.nametofont(name).configure(family=family, size=font_size)
+        font.nametofont("TkFixedFont").configure(size=font_size)
+        # Chiều cao dòng của Treeview theo cỡ chữ mới
+        self.style.configure("Treeview", rowheight=font.nametofont("TkDefaultFont").metrics("linespace") + 4)
 
     # Mô tả các function trong các tabs đã tạo
     # Thêm sách
@@ -337,15 +768,10 @@ class LibraryManagementSystem:
         quantity = self.quantity_entry.get()
         available = self.available_entry.get()
         if title and author and genre and quantity and available:
-            try:
-                self.cursor.execute(
-                    'INSERT INTO books (title, author, genre, quantity, available) VALUES (?, ?, ?, ?, ?)',
-                    (title, author, genre, quantity, available))
-                self.conn.commit()
-                self.books_tree.insert("", "end", values=(title, author, genre, quantity, available))
-                self.clear_fields()
-            except sqlite3.IntegrityError:
-                messagebox.showwarning("Warning", "Book with this title already exists!")
+            row = (title, author, genre, quantity, available)
+            self.run_db(lambda repo, job: repo.insert("books", [row]),
+                        on_done=self.after_write(self.books_view, self.clear_fields),
+                        integrity_message="Book with this title already exists!")
         else:
             messagebox.showwarning("Warning", "All fields are required, please try again!")
 
@@ -358,11 +784,9 @@ class LibraryManagementSystem:
             genre = self.genre_entry.get()
             quantity = self.quantity_entry.get()
             available = self.available_entry.get()
-            self.books_tree.item(selected_item, values=(title, author, genre, quantity, available))
-            self.cursor.execute('UPDATE books SET author = ?, genre = ?, quantity = ?, available = ? WHERE title = ?',
-                                (author, genre, quantity, available, title))
-            self.conn.commit()
-            self.clear_fields()
+            row = (title, author, genre, quantity, available)
+            self.run_db(lambda repo, job: repo.update("books", [row]),
+                        on_done=self.after_write(self.books_view, self.clear_fields))
         else:
             messagebox.showwarning("Warning", "You must select a book!")
 
@@ -371,10 +795,8 @@ class LibraryManagementSystem:
         selected_item = self.books_tree.selection()
         if selected_item:
             title = self.books_tree.item(selected_item, 'values')[0]
-            self.books_tree.delete(selected_item)
-            self.cursor.execute('DELETE FROM books WHERE title = ?', (title,))
-            self.conn.commit()
-            self.clear_fields()
+            self.run_db(lambda repo, job: repo.delete("books", [title]),
+                        on_done=self.after_write(self.books_view, self.clear_fields))
         else:
             messagebox.showwarning("Warning", "You must select a book!")
 
@@ -394,15 +816,10 @@ class LibraryManagementSystem:
         books_borrowed = self.books_borrowed_entry.get()
         quantity_borrowed = self.quantity_borrowed_entry.get()
         if member_id and name and membership_date and books_borrowed and quantity_borrowed:
-            try:
-                self.cursor.execute('INSERT INTO members VALUES (?, ?, ?, ?, ?)',
-                                    (member_id, name, membership_date, books_borrowed, quantity_borrowed))
-                self.conn.commit()
-                self.members_tree.insert("", "end",
-                                         values=(member_id, name, membership_date, books_borrowed, quantity_borrowed))
-                self.clear_member_fields()
-            except sqlite3.IntegrityError:
-                messagebox.showwarning("Warning", "Member with this ID already exists!")
+            row = (member_id, name, membership_date, books_borrowed, quantity_borrowed)
+            self.run_db(lambda repo, job: repo.insert("members", [row]),
+                        on_done=self.after_write(self.members_view, self.clear_member_fields),
+                        integrity_message="Member with this ID already exists!")
         else:
             messagebox.showwarning("Warning", "All fields are required, please try again!")
 
@@ -415,13 +832,9 @@ class LibraryManagementSystem:
             membership_date = self.membership_date_entry.get()
             books_borrowed = self.books_borrowed_entry.get()
             quantity_borrowed = self.quantity_borrowed_entry.get()
-            self.members_tree.item(selected_item,
-                                   values=(member_id, name, membership_date, books_borrowed, quantity_borrowed))
-            self.cursor.execute(
-                'UPDATE members SET name = ?, membership_date = ?, books_borrowed = ?, quantity_borrowed = ? WHERE member_id = ?',
-                (name, membership_date, books_borrowed, quantity_borrowed, member_id))
-            self.conn.commit()
-            self.clear_member_fields()
+            row = (member_id, name, membership_date, books_borrowed, quantity_borrowed)
+            self.run_db(lambda repo, job: repo.update("members", [row]),
+                        on_done=self.after_write(self.members_view, self.clear_member_fields))
         else:
             messagebox.showwarning("Warning", "You must select a member!")
 
@@ -430,10 +843,19 @@ class LibraryManagementSystem:
         selected_item = self.members_tree.selection()
         if selected_item:
             member_id = self.members_tree.item(selected_item, 'values')[0]
-            self.members_tree.delete(selected_item)
-            self.cursor.execute('DELETE FROM members WHERE member_id = ?', (member_id,))
-            self.conn.commit()
-            self.clear_member_fields()
+            self.run_db(lambda repo, job: repo.delete("members", [member_id]),
+                        on_done=self.after_write(self.members_view, self.clear_member_fields))
+        else:
+            messagebox.showwarning("Warning", "You must select a member!")
+
+    # Hiển thị các sách thành viên đang chọn đang mượn (tra cứu theo chỉ mục của bảng loans)
+    def show_member_loans(self):
+        selected_item = self.members_tree.selection()
+        if selected_item:
+            member_id = self.members_tree.item(selected_item, 'values')[0]
+            loans = self.repo.loans_for_member(member_id)
+            lines = [f"{title} (due {return_date})" if return_date else title for title, _, _, return_date in loans]
+            messagebox.showinfo("Loans", "\n".join(lines) or f"{member_id} has no books out")
         else:
             messagebox.showwarning("Warning", "You must select a member!")
 
@@ -453,15 +875,10 @@ class LibraryManagementSystem:
         borrow_date = self.borrow_date_entry.get()
         return_date = self.return_date_entry.get()
         if transaction_id and book_id and member_id and borrow_date and return_date:
-            try:
-                self.cursor.execute('INSERT INTO transactions VALUES (?, ?, ?, ?, ?)',
-                                    (transaction_id, book_id, member_id, borrow_date, return_date))
-                self.conn.commit()
-                self.transactions_tree.insert("", "end",
-                                              values=(transaction_id, book_id, member_id, borrow_date, return_date))
-                self.clear_transaction_fields()
-            except sqlite3.IntegrityError:
-                messagebox.showwarning("Warning", "Transaction with this ID already exists!")
+            row = (transaction_id, book_id, member_id, borrow_date, return_date)
+            self.run_db(lambda repo, job: repo.insert("transactions", [row]),
+                        on_done=self.after_write(self.transactions_view, self.clear_transaction_fields),
+                        integrity_message="Transaction with this ID already exists!")
         else:
             messagebox.showwarning("Warning", "All fields are required, please try again!")
 
@@ -474,13 +891,9 @@ class LibraryManagementSystem:
             member_id = self.trans_member_id_entry.get()
             borrow_date = self.borrow_date_entry.get()
             return_date = self.return_date_entry.get()
-            self.transactions_tree.item(selected_item,
-                                        values=(transaction_id, book_id, member_id, borrow_date, return_date))
-            self.cursor.execute(
-                'UPDATE transactions SET book_id = ?, member_id = ?, borrow_date = ?, return_date = ? WHERE transaction_id = ?',
-                (book_id, member_id, borrow_date, return_date, transaction_id))
-            self.conn.commit()
-            self.clear_transaction_fields()
+            row = (transaction_id, book_id, member_id, borrow_date, return_date)
+            self.run_db(lambda repo, job: repo.update("transactions", [row]),
+                        on_done=self.after_write(self.transactions_view, self.clear_transaction_fields))
         else:
             messagebox.showwarning("Warning", "You must select a transaction!")
 
@@ -489,10 +902,34 @@ class LibraryManagementSystem:
         selected_item = self.transactions_tree.selection()
         if selected_item:
             transaction_id = self.transactions_tree.item(selected_item, 'values')[0]
-            self.transactions_tree.delete(selected_item)
-            self.cursor.execute('DELETE FROM transactions WHERE transaction_id = ?', (transaction_id,))
-            self.conn.commit()
-            self.clear_transaction_fields()
+            self.run_db(lambda repo, job: delete_transaction(repo, transaction_id),
+                        on_done=self.after_write(self.transactions_view, self.clear_transaction_fields))
+        else:
+            messagebox.showwarning("Warning", "You must select a transaction!")
+
+    # Mượn sách: thêm giao dịch và cập nhật số sách còn lại, số sách thành viên đang mượn
+    def checkout_book(self):
+        transaction_id = self.transaction_id_entry.get()
+        book_id = self.trans_book_id_entry.get()
+        member_id = self.trans_member_id_entry.get()
+        borrow_date = self.borrow_date_entry.get()
+        return_date = self.return_date_entry.get()
+        if transaction_id and book_id and member_id and borrow_date and return_date:
+            self.run_db(lambda repo, job: checkout(repo, transaction_id, book_id, member_id, borrow_date, return_date),
+                        on_done=self.after_write(self.transactions_view, self.clear_transaction_fields,
+                                                 extra_views=(self.books_view, self.members_view)),
+                        integrity_message="Transaction with this ID already exists!")
+        else:
+            messagebox.showwarning("Warning", "All fields are required, please try again!")
+
+    # Trả sách của giao dịch đang chọn (ngày trả là hôm nay)
+    def return_borrowed_book(self):
+        selected_item = self.transactions_tree.selection()
+        if selected_item:
+            transaction_id = self.transactions_tree.item(selected_item, 'values')[0]
+            self.run_db(lambda repo, job: return_book(repo, transaction_id),
+                        on_done=self.after_write(self.transactions_view, info=("Return Book", "Book returned!"),
+                                                 extra_views=(self.books_view, self.members_view)))
         else:
             messagebox.showwarning("Warning", "You must select a transaction!")
 
@@ -504,50 +941,113 @@ class LibraryManagementSystem:
         self.borrow_date_entry.delete(0, tk.END)
         self.return_date_entry.delete(0, tk.END)
 
-    # Xem sách
+    # Xem sách (chỉ nạp trang đang hiển thị)
     def load_books(self):
-        self.cursor.execute('SELECT title, author, genre, quantity, available FROM books')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            self.books_tree.insert("", "end", values=row)
+        if self.books_view:
+            self.books_view.refresh()
 
     # Xem thành viên
     def load_members(self):
-        self.cursor.execute('SELECT member_id, name, membership_date, books_borrowed, quantity_borrowed FROM members')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            self.members_tree.insert("", "end", values=row)
+        if self.members_view:
+            self.members_view.refresh()
 
     # Xem giao dịch
     def load_transactions(self):
-        self.cursor.execute('SELECT * FROM transactions')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            self.transactions_tree.insert("", "end", values=row)
+        if self.transactions_view:
+            self.transactions_view.refresh()
+
+    # Tô màu các giao dịch quá hạn trong các dòng đang hiển thị
+    def overdue_tags(self, rows):
+        overdue = self.repo.overdue_among([row[0] for row in rows], date.today().isoformat())
+        return {rowid: ("overdue",) for rowid in overdue}
+
+    # Quét định kỳ số khoản mượn quá hạn trên luồng nền (dùng chỉ mục nên chỉ mất vài mili giây)
+    # Các dòng đang hiển thị được tô màu lại vì ngày hiện tại có thể đã thay đổi
+    def scan_overdue(self):
+        def on_done(count):
+            self.overdue_count = count
+            if self.transactions_view:
+                self.show_overdue_count()
+                self.transactions_view.render()
+
+        self.db_worker.submit(lambda repo, job: repo.count_overdue(date.today().isoformat()), on_done=on_done)
+        self.root.after(OVERDUE_SCAN_MS, self.scan_overdue)
+
+    def show_overdue_count(self):
+        if self.overdue_count is not None:
+            count = self.overdue_count
+            self.overdue_label.config(text=f"{count:,} overdue loans" if count else "No overdue loans")
+
+    # Báo cáo các khoản mượn quá hạn (hạn trả sớm nhất trước), đọc trên luồng nền
+    def show_overdue_report(self):
+        def report(repo, job):
+            today = date.today().isoformat()
+            return repo.count_overdue(today), repo.overdue(today)
+
+        self.db_worker.submit(report, on_done=self.open_overdue_window,
+                              on_error=lambda error: messagebox.showerror("Error", str(error)))
+
+    def open_overdue_window(self, result):
+        count, rows = result
+        window = tk.Toplevel(self.root)
+        window.title("Overdue Report")
+        window.geometry("800x400")
+        shown = f" (showing the first {len(rows):,})" if count > len(rows) else ""
+        ttk.Label(window, text=f"{count:,} overdue loans{shown}").pack(pady=10)
+        columns = ["Transaction ID", "Book ID", "Member ID", "Return Date", "Days Overdue"]
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=150)
+        tree.pack(fill=tk.BOTH, expand=True)
+        today = date.today()
+        for _, transaction_id, book_id, member_id, _, return_date, due in rows:
+            days = (today - date.fromisoformat(due)).days
+            tree.insert("", "end", values=(transaction_id, book_id, member_id, return_date, days))
+        ttk.Button(window, text="Close", command=window.destroy).pack(pady=10)
+
+    # Xem thống kê: chỉ đọc các bảng tổng hợp nhỏ nên không phụ thuộc số lượng sách hay giao dịch
+    def load_statistics(self):
+        totals, genres, top_titles = self.repo.statistics()
+        titles, copies, available, members, transactions, open_loans = totals
+        self.totals_label.config(
+            text=f"Titles: {titles:,}    Copies: {copies:,}    Available: {available:,}    "
+                 f"Utilization: {utilization(copies, available)}\n"
+                 f"Members: {members:,}    Transactions: {transactions:,}    Books out: {open_loans:,}")
+        self.genre_stats_tree.delete(*self.genre_stats_tree.get_children())
+        for genre, genre_titles, genre_copies, genre_available, loans in genres:
+            self.genre_stats_tree.insert("", "end", values=(genre or "(none)", genre_titles, genre_copies,
+                                                            genre_available,
+                                                            utilization(genre_copies, genre_available), loans))
+        self.top_titles_tree.delete(*self.top_titles_tree.get_children())
+        for title, loans in top_titles:
+            self.top_titles_tree.insert("", "end", values=(title, loans))
 
     # Thiết kế nút và cửa sổ Save as
     def open_save_as_window(self):
         self.save_as_window = tk.Toplevel(self.root)
         self.save_as_window.title("Save As")
         self.save_as_window.geometry("400x300")
-        tk.Label(self.save_as_window, text="Save Format").pack(pady=10)
+        ttk.Label(self.save_as_window, text="Save Format").pack(pady=10)
         self.save_format_var = tk.StringVar(value="sqlite")
         formats = ["SQLite", "Excel", "Word", "PDF"]
         for fmt in formats:
-            tk.Radiobutton(self.save_as_window, text=fmt, variable=self.save_format_var, value=fmt.lower()).pack(
+            ttk.Radiobutton(self.save_as_window, text=fmt, variable=self.save_format_var, value=fmt.lower()).pack(
                 anchor=tk.W)
-        tk.Label(self.save_as_window, text="Select Data to Save").pack(pady=10)
+        ttk.Label(self.save_as_window, text="Select Data to Save").pack(pady=10)
         self.save_books_var = tk.BooleanVar()
         self.save_members_var = tk.BooleanVar()
         self.save_transactions_var = tk.BooleanVar()
-        tk.Checkbutton(self.save_as_window, text="Books", variable=self.save_books_var).pack(anchor=tk.W)
-        tk.Checkbutton(self.save_as_window, text="Members", variable=self.save_members_var).pack(anchor=tk.W)
-        tk.Checkbutton(self.save_as_window, text="Transactions", variable=self.save_transactions_var).pack(anchor=tk.W)
-        tk.Button(self.save_as_window, text="Save", command=self.save_as).pack(pady=10)
-        tk.Button(self.save_as_window, text="Cancel", command=self.save_as_window.destroy).pack(pady=10)
+        ttk.Checkbutton(self.save_as_window, text="Books", variable=self.save_books_var).pack(anchor=tk.W)
+        ttk.Checkbutton(self.save_as_window, text="Members", variable=self.save_members_var).pack(anchor=tk.W)
+        ttk.Checkbutton(self.save_as_window, text="Transactions", variable=self.save_transactions_var).pack(anchor=tk.W)
+        ttk.Button(self.save_as_window, text="Save", command=self.save_as).pack(pady=10)
+        ttk.Button(self.save_as_window, text="Cancel", command=self.save_as_window.destroy).pack(pady=10)
 
     # Mô tả tính năng Save as
+    # Các module xuất dữ liệu chỉ được nạp khi lưu lần đầu
     def save_as(self):
+        from library_export import export_tables
         format_selected = self.save_format_var.get()
         if format_selected not in ["sqlite", "excel", "word", "pdf"]:
             messagebox.showwarning("Warning", "Unknown save format selected")
@@ -564,259 +1064,47 @@ class LibraryManagementSystem:
         if not file_path:
             return
 
-        save_successful = True
-        if self.save_books_var.get():
-            save_successful &= self.save_books(format_selected, file_path)
-        if self.save_members_var.get():
-            save_successful &= self.save_members(format_selected, file_path)
-        if self.save_transactions_var.get():
-            save_successful &= self.save_transactions(format_selected, file_path)
-
-        if save_successful:
-            messagebox.showinfo("Save As", "Data saved successfully")
-        else:
-            messagebox.showerror("Error", "Failed to save some data")
+        # Tất cả các bảng được chọn được lưu vào cùng một file trong một lần đọc
+        tables = [name for name, var in (("books", self.save_books_var), ("members", self.save_members_var),
+                                         ("transactions", self.save_transactions_var)) if var.get()]
+        self.run_in_background("Saving",
+                               lambda repo, job: export_tables(repo, format_selected, file_path, tables,
+                                                               progress=job.report),
+                               on_done=lambda result: messagebox.showinfo("Save As", "Data saved successfully"),
+                               on_error=lambda error: messagebox.showerror("Error",
+                                                                           f"Failed to save data: {str(error)}"))
         self.save_as_window.destroy()
 
-    # Mô tả các định dạng và dữ liệu lưu (sqlite, excel, word, pdf)
-    # Sách
-    def save_books(self, format_selected, file_path):
-        try:
-            if format_selected == "sqlite":
-                self.save_books_as_sqlite(file_path)
-            elif format_selected == "excel":
-                self.save_books_as_excel(file_path)
-            elif format_selected == "word":
-                self.save_books_as_word(file_path)
-            elif format_selected == "pdf":
-                self.save_books_as_pdf(file_path)
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save books: {str(e)}")
-            return False
-
-    # Thành viên
-    def save_members(self, format_selected, file_path):
-        try:
-            if format_selected == "sqlite":
-                self.save_members_as_sqlite(file_path)
-            elif format_selected == "excel":
-                self.save_members_as_excel(file_path)
-            elif format_selected == "word":
-                self.save_members_as_word(file_path)
-            elif format_selected == "pdf":
-                self.save_members_as_pdf(file_path)
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save members: {str(e)}")
-            return False
-
-    # Giao dịch
-    def save_transactions(self, format_selected, file_path):
-        try:
-            if format_selected == "sqlite":
-                self.save_transactions_as_sqlite(file_path)
-            elif format_selected == "excel":
-                self.save_transactions_as_excel(file_path)
-            elif format_selected == "word":
-                self.save_transactions_as_word(file_path)
-            elif format_selected == "pdf":
-                self.save_transactions_as_pdf(file_path)
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save transactions: {str(e)}")
-            return False
-
-    # Mô tả tính năng lưu cho các dữ liệu trong từng tab
-    # Sách
-    def save_books_as_sqlite(self, file_path):
-        # Lưu dạng Sqlite
-        pass
-
-    def save_books_as_excel(self, file_path):
-        import pandas as pd
-        data = []
-        self.cursor.execute('SELECT title, author, genre, quantity, available FROM books')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            data.append(row)
-        df = pd.DataFrame(data, columns=["Title", "Author", "Genre", "Quantity", "Available"])
-        df.to_excel(file_path, index=False)
-
-    def save_books_as_word(self, file_path):
-        from docx import Document
-        self.cursor.execute('SELECT title, author, genre, quantity, available FROM books')
-        rows = self.cursor.fetchall()
-        doc = Document()
-        doc.add_heading('Books Data', 0)
-        table = doc.add_table(rows=1, cols=5)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Title'
-        hdr_cells[1].text = 'Author'
-        hdr_cells[2].text = 'Genre'
-        hdr_cells[3].text = 'Quantity'
-        hdr_cells[4].text = 'Available'
-        for row in rows:
-            cells = table.add_row().cells
-            for i, item in enumerate(row):
-                cells[i].text = str(item)
-        doc.save(file_path)
-
-    def save_books_as_pdf(self, file_path):
-        from fpdf import FPDF
-        self.cursor.execute('SELECT title, author, genre, quantity, available FROM books')
-        rows = self.cursor.fetchall()
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Books Data", ln=True, align='C')
-        for row in rows:
-            line = ", ".join(map(str, row))
-            pdf.cell(200, 10, txt=line, ln=True)
-        pdf.output(file_path)
-
-    # Thành viên
-    def save_members_as_sqlite(self, file_path):
-        pass
-
-    def save_members_as_excel(self, file_path):
-        data = []
-        self.cursor.execute('SELECT member_id, name, membership_date, books_borrowed, quantity_borrowed FROM members')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            data.append(row)
-        df = pd.DataFrame(data, columns=["Member ID", "Name", "Membership Date", "Books Borrowed", "Quantity Borrowed"])
-        df.to_excel(file_path, index=False)
-
-    def save_members_as_word(self, file_path):
-        data = []
-        self.cursor.execute('SELECT member_id, name, membership_date, books_borrowed, quantity_borrowed FROM members')
-        rows = self.cursor.fetchall()
-        doc = Document()
-        doc.add_heading('Members Data', 0)
-        table = doc.add_table(rows=1, cols=5)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Member ID'
-        hdr_cells[1].text = 'Name'
-        hdr_cells[2].text = 'Membership Date'
-        hdr_cells[3].text = 'Books Borrowed'
-        hdr_cells[4].text = 'Quantity Borrowed'
-        for row in rows:
-            cells = table.add_row().cells
-            for i, item in enumerate(row):
-                cells[i].text = str(item)
-        doc.save(file_path)
-
-    def save_members_as_pdf(self, file_path):
-        data = []
-        self.cursor.execute('SELECT member_id, name, membership_date, books_borrowed, quantity_borrowed FROM members')
-        rows = self.cursor.fetchall()
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Members Data", ln=True, align='C')
-        for row in rows:
-            line = ", ".join(map(str, row))
-            pdf.cell(200, 10, txt=line, ln=True)
-        pdf.output(file_path)
-
-    # Giao dịch
-    def save_transactions_as_sqlite(self, file_path):
-        pass
-
-    def save_transactions_as_excel(self, file_path):
-        data = []
-        self.cursor.execute('SELECT transaction_id, book_id, member_id, borrow_date, return_date FROM transactions')
-        rows = self.cursor.fetchall()
-        for row in rows:
-            data.append(row)
-        df = pd.DataFrame(data, columns=["Transaction ID", "Book ID", "Member ID", "Borrow Date", "Return Date"])
-        df.to_excel(file_path, index=False)
-
-    def save_transactions_as_word(self, file_path):
-        data = []
-        self.cursor.execute('SELECT transaction_id, book_id, member_id, borrow_date, return_date FROM transactions')
-        rows = self.cursor.fetchall()
-        doc = Document()
-        doc.add_heading('Transactions Data', 0)
-        table = doc.add_table(rows=1, cols=5)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Transaction ID'
-        hdr_cells[1].text = 'Book ID'
-        hdr_cells[2].text = 'Member ID'
-        hdr_cells[3].text = 'Borrow Date'
-        hdr_cells[4].text = 'Return Date'
-        for row in rows:
-            cells = table.add_row().cells
-            for i, item in enumerate(row):
-                cells[i].text = str(item)
-        doc.save(file_path)
-
-    def save_transactions_as_pdf(self, file_path):
-        data = []
-        self.cursor.execute('SELECT transaction_id, book_id, member_id, borrow_date, return_date FROM transactions')
-        rows = self.cursor.fetchall()
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Transactions Data", ln=True, align='C')
-        for row in rows:
-            line = ", ".join(map(str, row))
-            pdf.cell(200, 10, txt=line, ln=True)
-        pdf.output(file_path)
-
     # Mô tả tính năng Import (Nhập dữ liệu từ file csv)
+    # File được đọc và ghi theo từng khối trên luồng nền, có thể huỷ giữa chừng
+    # Người dùng chọn gộp vào dữ liệu hiện có hoặc thay thế toàn bộ bảng
     def import_data(self):
+        from library_import import import_csv
         file_path = filedialog.askopenfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
         if not file_path:
             return
-        with open(file_path, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            data = list(reader)
-        if not data:
-            messagebox.showwarning("Warning", "No data found in the selected file")
+        merge = messagebox.askyesnocancel(
+            "Import", "Merge the file into the existing data?\n\n"
+                      "Yes: add new rows and update changed rows, keep everything else\n"
+                      "No: replace all existing data of the table")
+        if merge is None:
             return
-        headers = data[0]
-        if headers == ["Title", "Author", "Genre", "Quantity", "Available"]:
-            self.import_books(data[1:])
-        elif headers == ["Member ID", "Name", "Membership Date", "Books Borrowed", "Quantity Borrowed"]:
-            self.import_members(data[1:])
-        elif headers == ["Transaction ID", "Book ID", "Member ID", "Borrow Date", "Return Date"]:
-            self.import_transactions(data[1:])
+        mode = "merge" if merge else "replace"
+        self.run_in_background("Importing",
+                               lambda repo, job: import_csv(repo, file_path, mode=mode, progress=job.report),
+                               on_done=self.on_data_imported, on_error=self.on_import_error)
+
+    # Làm mới tab tương ứng sau khi nhập xong
+    def on_data_imported(self, result):
+        getattr(self, f"load_{result.table}")()
+        messagebox.showinfo("Import Data", f"{result.table.capitalize()} data imported successfully\n{result}")
+
+    def on_import_error(self, error):
+        from library_import import CsvFormatError
+        if isinstance(error, CsvFormatError):
+            messagebox.showwarning("Warning", str(error))
         else:
-            messagebox.showwarning("Warning", "Invalid data format in the selected file")
-
-    # Nhập dữ liệu sách
-    def import_books(self, data):
-        self.reset_books(confirm=False)
-        for row in data:
-            self.cursor.execute('INSERT INTO books (title, author, genre, quantity, available) VALUES (?, ?, ?, ?, ?)',
-                                row)
-        self.conn.commit()
-        self.load_books()
-        messagebox.showinfo("Import Data", "Books data imported successfully")
-
-    # Nhập dữ liệu thành viên
-    def import_members(self, data):
-        self.reset_members(confirm=False)
-        for row in data:
-            self.cursor.execute(
-                'INSERT INTO members (member_id, name, membership_date, books_borrowed, quantity_borrowed) VALUES (?, ?, ?, ?, ?)',
-                row)
-        self.conn.commit()
-        self.load_members()
-        messagebox.showinfo("Import Data", "Members data imported successfully")
-
-    # Nhập dữ liệu giao dịch
-    def import_transactions(self, data):
-        self.reset_transactions(confirm=False)
-        for row in data:
-            self.cursor.execute(
-                'INSERT INTO transactions (transaction_id, book_id, member_id, borrow_date, return_date) VALUES (?, ?, ?, ?, ?)',
-                row)
-        self.conn.commit()
-        self.load_transactions()
-        messagebox.showinfo("Import Data", "Transactions data imported successfully")
+            messagebox.showerror("Error", f"Failed to import data: {str(error)}")
 
 
 # Chạy ứng dụng
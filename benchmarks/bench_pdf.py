@@ -0,0 +1,46 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_data import book_rows
+from library_export import export_pdf
+from library_repository import LibraryRepository
+
+
+# Tạo cơ sở dữ liệu trong bộ nhớ với số lượng sách cho trước
+def make_repo(rows):
+    repo = LibraryRepository(sqlite3.connect(':memory:'))
+    repo.ensure_schema()
+    repo.insert("books", book_rows(rows, random.Random(0)))
+    return repo
+
+
+# Đo tốc độ xuất PDF (trang/giây) với số tiến trình khác nhau
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF report engine")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}",
+                        help="comma-separated worker counts to compare")
+    args = parser.parse_args()
+
+    repo = make_repo(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in sorted({int(value) for value in args.workers.split(",")}):
+            pages = []
+            file_path = os.path.join(directory, f"books-{workers}.pdf")
+            start = time.perf_counter()
+            export_pdf(repo, file_path, ["books"], progress=lambda done, total: pages.append(done),
+                       workers=workers)
+            seconds = time.perf_counter() - start
+            print(f"rows={args.rows} workers={workers} pages={pages[-1]} seconds={seconds:.2f} "
+                  f"pages/sec={pages[-1] / seconds:,.1f} size={os.path.getsize(file_path):,} bytes", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_data import book_rows, member_rows, transaction_rows
+from library_repository import LibraryRepository
+
+
+# Tạo file cơ sở dữ liệu lớn (nếu chưa có) để đo thời gian khởi động
+def make_database(path, rows):
+    if os.path.exists(path):
+        return
+    rng = random.Random(0)
+    repo = LibraryRepository.open(path)
+    repo.insert("books", book_rows(rows, rng))
+    repo.insert("members", member_rows(rows, rows, rng))
+    repo.insert("transactions", transaction_rows(rows, rows, rows, rng))
+    repo.close()
+
+
+# Nạp module giao diện (tên file có dấu cách nên không import trực tiếp được)
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("library_app", os.path.join(ROOT, "Library Management System.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Đo thời gian từ lúc nạp module tới khi cửa sổ được vẽ lần đầu (cần màn hình hoặc Xvfb)
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the time to first paint of the desktop app")
+    parser.add_argument("--db", default="bench_startup.db", help="database to open (created if missing)")
+    parser.add_argument("--rows", type=int, default=1000000, help="rows per table when creating the database")
+    args = parser.parse_args()
+
+    make_database(args.db, args.rows)
+    start = time.perf_counter()
+    app_module = load_app_module()
+    imported = time.perf_counter()
+    app_module.DB_PATH = args.db
+    root = app_module.tk.Tk()
+    app = app_module.LibraryManagementSystem(root)
+    built = time.perf_counter()
+    # Xử lý các sự kiện đang chờ (map, vẽ cửa sổ) như vòng lặp mainloop đầu tiên
+    root.update()
+    painted = time.perf_counter()
+    print(f"db={args.db} import={(imported - start) * 1000:.0f}ms build={(built - imported) * 1000:.0f}ms "
+          f"first_paint={(painted - start) * 1000:.0f}ms", flush=True)
+    app.close()
+
+
+if __name__ == "__main__":
+    main()
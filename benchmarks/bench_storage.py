@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_data import book_rows
+from library_repository import STORAGE_PROFILES, LibraryRepository
+
+
+# Độ trễ (ms) của từng thao tác thêm một dòng, mỗi thao tác commit riêng hoặc commit theo nhóm group_size
+def measure_writes(repo, writes, group_size=1):
+    latencies = []
+    for start in range(0, writes, group_size):
+        if group_size > 1:
+            repo.begin_group()
+        for i in range(start, min(start + group_size, writes)):
+            began = time.perf_counter()
+            repo.insert("books", [(f"Edit {group_size}-{i}", "Author", "Genre", 1, 1)])
+            latencies.append(time.perf_counter() - began)
+        if group_size > 1:
+            began = time.perf_counter()
+            repo.end_group()
+            # Thời gian commit được chia đều cho các thao tác trong nhóm
+            commit = (time.perf_counter() - began) / group_size
+            latencies[-group_size:] = [latency + commit for latency in latencies[-group_size:]]
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+# Tốc độ đọc: duyệt toàn bộ bảng và đọc các trang ngẫu nhiên (như khi cuộn TreeView)
+def measure_reads(repo, pages):
+    start = time.perf_counter()
+    rows = sum(1 for _ in repo.iter_rows("books"))
+    scan = rows / (time.perf_counter() - start)
+    total = repo.count("books")
+    start = time.perf_counter()
+    for _ in range(pages):
+        repo.page("books", repo.rowid_before("books", random.randrange(total)))
+    return scan, pages / (time.perf_counter() - start)
+
+
+# So sánh độ trễ ghi và tốc độ đọc giữa các cấu hình lưu trữ
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite storage profiles")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--group", type=int, default=20, help="edits per group commit")
+    parser.add_argument("--pages", type=int, default=2000, help="random page reads")
+    parser.add_argument("--dir", default=None, help="directory for the test databases (use a real disk)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for profile in STORAGE_PROFILES:
+            repo = LibraryRepository.open(os.path.join(directory, f"{profile}.db"), profile)
+            repo.insert("books", book_rows(args.rows, random.Random(0)))
+            p50, p95 = measure_writes(repo, args.writes)
+            group_p50, group_p95 = measure_writes(repo, args.writes, args.group)
+            scan, pages = measure_reads(repo, args.pages)
+            print(f"profile={profile} write_p50={p50:.2f}ms write_p95={p95:.2f}ms "
+                  f"group{args.group}_p50={group_p50:.2f}ms group{args.group}_p95={group_p95:.2f}ms "
+                  f"scan={scan:,.0f} rows/sec pages={pages:,.0f} pages/sec", flush=True)
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_data import member_rows
+from library_export import TABLE_TITLES, export_word
+from library_import import IMPORT_HEADERS
+from library_repository import LibraryRepository
+
+
+# Tạo cơ sở dữ liệu trong bộ nhớ với số lượng thành viên cho trước
+def make_repo(rows):
+    repo = LibraryRepository(sqlite3.connect(':memory:'))
+    repo.ensure_schema()
+    repo.insert("members", member_rows(rows, rows, random.Random(0)))
+    return repo
+
+
+# Cách xuất Word cũ: thêm từng dòng bằng table.add_row().cells của python-docx
+def export_word_per_cell(repo, file_path, table):
+    from docx import Document
+    doc = Document()
+    doc.add_heading(TABLE_TITLES[table], 0)
+    headers = IMPORT_HEADERS[table]
+    word_table = doc.add_table(rows=1, cols=len(headers))
+    for cell, header in zip(word_table.rows[0].cells, headers):
+        cell.text = header
+    for row in repo.iter_rows(table):
+        for cell, value in zip(word_table.add_row().cells, row):
+            cell.text = str(value)
+    doc.save(file_path)
+
+
+# So sánh tốc độ xuất Word (dòng/giây) giữa cách cũ và cách dựng XML theo khối
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Word export")
+    parser.add_argument("--rows", default="1000,10000,100000",
+                        help="comma-separated table sizes to compare")
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="largest size measured with the per-cell export")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sorted({int(value) for value in args.rows.split(",")}):
+            repo = make_repo(rows)
+            methods = [("bulk", lambda path: export_word(repo, path, ["members"]))]
+            if rows <= args.legacy_max:
+                methods.insert(0, ("per-cell", lambda path: export_word_per_cell(repo, path, "members")))
+            for name, export in methods:
+                file_path = os.path.join(directory, f"members-{name}-{rows}.docx")
+                start = time.perf_counter()
+                export(file_path)
+                seconds = time.perf_counter() - start
+                print(f"rows={rows} method={name} seconds={seconds:.2f} rows/sec={rows / seconds:,.0f} "
+                      f"size={os.path.getsize(file_path):,} bytes", flush=True)
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
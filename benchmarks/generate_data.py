@@ -0,0 +1,122 @@
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library_import import IMPORT_HEADERS
+
+# Tên file CSV giống các file mẫu đi kèm repo
+CSV_FILES = {
+    "books": "Book Tab.csv",
+    "members": "Member Tab.csv",
+    "transactions": "Transaction Tab.csv",
+}
+
+ADJECTIVES = ["Silent", "Crimson", "Hidden", "Broken", "Golden", "Forgotten", "Endless", "Distant", "Wild", "Last",
+              "Secret", "Burning", "Frozen", "Quiet", "Lost", "Bright", "Hollow", "Ancient", "Wandering", "Little"]
+NOUNS = ["River", "Garden", "Kingdom", "Letters", "Mountain", "Shadow", "Journey", "House", "Sea", "Empire",
+         "Orchard", "Station", "Library", "Harbor", "Forest", "Island", "Promise", "Winter", "City", "Voyage",
+         "Lantern", "Road", "Tower", "Country", "Bridge"]
+FIRST_NAMES = ["Tillie", "Fay", "Liam", "Olivia", "Noah", "Emma", "Minh", "Linh", "Lucas", "Mia", "Ethan", "Ava",
+               "Hana", "Kenji", "Sofia", "Mateo", "Amara", "Omar", "Chloe", "Arjun", "Elena", "Jonas", "Priya",
+               "Quang", "Zara", "Felix", "Nora", "Diego", "Ines", "Tuan"]
+LAST_NAMES = ["Keller", "Schroeder", "Nguyen", "Tran", "Smith", "Garcia", "Muller", "Rossi", "Tanaka", "Kim",
+              "Okafor", "Silva", "Novak", "Haddad", "Patel", "Johansson", "Dubois", "Kowalski", "Le", "Pham",
+              "Murphy", "Costa", "Ivanova", "Yilmaz", "Santos", "Fischer", "Moreau", "Reyes", "Lindqvist", "Vo"]
+GENRES = ["Historical fiction", "Philosophical Novel", "Fantasy", "Science fiction", "Mystery", "Thriller",
+          "Romance", "Adventure", "Horror", "Biography", "Poetry", "Drama", "Classic", "Young adult",
+          "Children's literature", "Dystopian", "Memoir", "Self-help", "History", "Travel"]
+
+# Khoảng ngày của ngày đăng ký thành viên và ngày mượn
+FIRST_DATE = date(2015, 1, 1)
+DATE_SPAN_DAYS = (date(2025, 12, 31) - FIRST_DATE).days
+
+
+# Tên sách thứ i (duy nhất, tính lại được từ i nên không phải giữ danh sách tên sách trong bộ nhớ)
+def book_title(i):
+    combinations = len(ADJECTIVES) * len(NOUNS)
+    title = f"The {ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[i // len(ADJECTIVES) % len(NOUNS)]}"
+    volume = i // combinations
+    return f"{title} {volume + 1}" if volume else title
+
+
+def member_id(i):
+    return str(10000 + i)
+
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def random_date(rng):
+    return FIRST_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+
+
+def format_date(value):
+    return value.strftime("%d/%m/%Y")
+
+
+# Các dòng sách: số bản 1-100, số bản còn lại không vượt quá số bản
+def book_rows(count, rng):
+    for i in range(count):
+        quantity = rng.randint(1, 100)
+        yield (book_title(i), person_name(rng), rng.choice(GENRES), quantity, rng.randint(0, quantity))
+
+
+# Các dòng thành viên: đang mượn 0-3 cuốn trong số books sách đã tạo
+def member_rows(count, books, rng):
+    for i in range(count):
+        borrowed = [book_title(rng.randrange(books)) for _ in range(rng.choice((0, 0, 1, 1, 2, 3)))] if books else []
+        yield (member_id(i), person_name(rng), format_date(random_date(rng)), ", ".join(borrowed), len(borrowed))
+
+
+# Các dòng giao dịch: sách và thành viên có thật, hạn trả 14-60 ngày sau ngày mượn
+def transaction_rows(count, books, members, rng):
+    for i in range(count):
+        borrowed = random_date(rng)
+        yield (f"T{i:08d}", book_title(rng.randrange(books)) if books else "",
+               member_id(rng.randrange(members)) if members else "", format_date(borrowed),
+               format_date(borrowed + timedelta(days=rng.randint(14, 60))))
+
+
+# Ghi các dòng ra file CSV với dòng tiêu đề giống file mẫu
+def write_csv(file_path, table, rows):
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(IMPORT_HEADERS[table])
+        writer.writerows(rows)
+
+
+# Tạo ba file CSV (sách, thành viên, giao dịch) trong thư mục cho trước, trả về {bảng: đường dẫn}
+def generate(directory, books, members, transactions, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {table: os.path.join(directory, name) for table, name in CSV_FILES.items()}
+    write_csv(paths["books"], "books", book_rows(books, rng))
+    write_csv(paths["members"], "members", member_rows(members, books, rng))
+    write_csv(paths["transactions"], "transactions", transaction_rows(transactions, books, members, rng))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic library CSV files (same schema as the samples)")
+    parser.add_argument("--rows", type=int, default=100000, help="rows per table (1e3 to 1e7)")
+    parser.add_argument("--books", type=int, default=None, help="override the number of books")
+    parser.add_argument("--members", type=int, default=None, help="override the number of members")
+    parser.add_argument("--transactions", type=int, default=None, help="override the number of transactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="generated", help="output directory")
+    args = parser.parse_args()
+
+    counts = [args.rows if value is None else value for value in (args.books, args.members, args.transactions)]
+    paths = generate(args.out, *counts, seed=args.seed)
+    for (table, file_path), rows in zip(paths.items(), counts):
+        print(f"{table}: {rows:,} rows -> {file_path} ({os.path.getsize(file_path):,} bytes)", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_data import book_title, generate, member_id
+from library_export import EXPORTERS, export_tables
+from library_import import import_csv
+from library_repository import PAGE_SIZE, LibraryRepository
+
+# Đuôi file của từng định dạng xuất
+EXPORT_EXTENSIONS = {"sqlite": "db", "excel": "xlsx", "word": "docx", "pdf": "pdf"}
+
+
+# Thời gian (giây) của lần chạy nhanh nhất và trung vị sau repeat lần chạy
+def timed(func, repeat=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "repeat": repeat}
+
+
+# In kết quả của một phép đo ngay khi có (phù hợp với log của các lần chạy dài)
+def report(rows, group, name, result):
+    if "skipped" in result:
+        print(f"rows={rows} {group}.{name} skipped: {result['skipped']}", flush=True)
+    else:
+        extra = f" rows/sec={result['rows_per_sec']:,.0f}" if "rows_per_sec" in result else ""
+        print(f"rows={rows} {group}.{name} seconds={result['seconds']:.4f}{extra}", flush=True)
+
+
+# Nhập ba file CSV theo thứ tự sách, thành viên, giao dịch (giống thứ tự nhập trên giao diện)
+def bench_import(repo, paths, rows, workers):
+    results = {}
+    for table, file_path in paths.items():
+        start = time.perf_counter()
+        import_csv(repo, file_path, workers=workers)
+        seconds = time.perf_counter() - start
+        results[table] = {"seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0}
+        report(rows, "import", table, results[table])
+    return results
+
+
+# Nạp dữ liệu cho TreeView như khi cuộn: trang đầu, các trang kế tiếp, nhảy tới giữa bảng,
+# trang đầu khi sắp xếp theo cột; nếu có màn hình thì đo thêm việc điền các trang vào một ttk.Treeview thật
+def bench_tree(repo, rows, pages, repeat):
+    results = {}
+
+    def scroll(order=None):
+        after = None
+        for _ in range(pages):
+            page_rows, after = repo.view_page("books", after, PAGE_SIZE, order)
+            if not page_rows:
+                break
+
+    results["first_page"] = timed(lambda: repo.view_page("books"), repeat)
+    results[f"scroll_{pages}_pages"] = timed(scroll, repeat)
+    results["jump_to_middle"] = timed(
+        lambda: repo.view_page("books", repo.key_before("books", rows // 2), PAGE_SIZE), repeat)
+    results["sorted_first_page"] = timed(lambda: repo.view_page("books", order=("available", True)), repeat)
+    results[f"sorted_scroll_{pages}_pages"] = timed(lambda: scroll(("author", False)), repeat)
+    results["sorted_jump_to_middle"] = timed(
+        lambda: repo.view_page("books", repo.key_before("books", rows // 2, ("author", False)), PAGE_SIZE,
+                               ("author", False)), repeat)
+    results["treeview_fill"] = bench_treeview(repo, pages, repeat)
+    for name, result in results.items():
+        report(rows, "tree", name, result)
+    return results
+
+
+# Điền các trang vào một ttk.Treeview thật qua TreeModel của giao diện (cần màn hình hoặc Xvfb)
+def bench_treeview(repo, pages, repeat):
+    import tkinter as tk
+    from tkinter import ttk
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        return {"skipped": f"no display ({error})"}
+    try:
+        spec = importlib.util.spec_from_file_location("library_app", os.path.join(ROOT, "Library Management System.py"))
+        app_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app_module)
+        tree = ttk.Treeview(root, columns=repo.table_spec("books")[1], show="headings")
+        model = app_module.TreeModel(tree)
+
+        def fill():
+            after = None
+            for _ in range(pages):
+                page_rows, after = repo.view_page("books", after, PAGE_SIZE)
+                model.apply(page_rows)
+                root.update_idletasks()
+
+        return timed(fill, repeat)
+    finally:
+        root.destroy()
+
+
+# Xuất cả ba bảng bằng từng định dạng; định dạng thiếu thư viện được ghi là bỏ qua
+def bench_export(repo, directory, rows, formats, workers):
+    results = {}
+    for format_selected in formats:
+        file_path = os.path.join(directory, f"export-{rows}.{EXPORT_EXTENSIONS[format_selected]}")
+        options = {"workers": workers} if format_selected == "pdf" and workers else {}
+        try:
+            start = time.perf_counter()
+            export_tables(repo, format_selected, file_path, ["books", "members", "transactions"], **options)
+            seconds = time.perf_counter() - start
+        except ImportError as error:
+            results[format_selected] = {"skipped": f"missing dependency ({error})"}
+        else:
+            results[format_selected] = {"seconds": seconds, "rows_per_sec": rows * 3 / seconds if seconds else 0,
+                                        "bytes": os.path.getsize(file_path)}
+            os.remove(file_path)
+        report(rows, "export", format_selected, results[format_selected])
+    return results
+
+
+# Các truy vấn chính của giao diện
+def bench_queries(repo, rows, repeat):
+    today = date.today().isoformat()
+    some_member = member_id(rows // 2)
+    queries = {
+        "count_books": lambda: repo.count("books"),
+        "search_prefix": lambda: repo.search("books", "Sil"),
+        "search_words": lambda: repo.search("books", "hidden library"),
+        "filter_count": lambda: repo.count("books", {"genre": "Fantasy"}),
+        "get_book": lambda: repo.get("books", book_title(rows // 2)),
+        "statistics": lambda: repo.statistics(),
+        "count_overdue": lambda: repo.count_overdue(today),
+        "overdue_report": lambda: repo.overdue(today),
+        "loans_for_member": lambda: repo.loans_for_member(some_member),
+        "transactions_for_member": lambda: repo.transactions_for_member(some_member),
+    }
+    results = {}
+    for name, query in queries.items():
+        results[name] = timed(query, repeat)
+        report(rows, "queries", name, results[name])
+    return results
+
+
+# In thay đổi thời gian so với một file kết quả trước đó (cùng số dòng và cùng phép đo)
+def compare(previous_path, results):
+    with open(previous_path, encoding="utf-8") as file:
+        previous = {run["rows"]: run for run in json.load(file)["runs"]}
+    for run in results["runs"]:
+        old_run = previous.get(run["rows"])
+        if old_run is None:
+            continue
+        for group in ("import", "tree", "export", "queries"):
+            for name, result in run[group].items():
+                old = old_run.get(group, {}).get(name, {})
+                if "seconds" in result and old.get("seconds"):
+                    change = result["seconds"] / old["seconds"]
+                    print(f"rows={run['rows']} {group}.{name} {old['seconds']:.4f}s -> {result['seconds']:.4f}s "
+                          f"({change:.2f}x)", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import, tree loading, exports and queries")
+    parser.add_argument("--rows", default="1000,10000,100000",
+                        help="comma-separated rows per table (1e3 to 1e7)")
+    parser.add_argument("--formats", default=",".join(EXPORTERS), help="comma-separated export formats")
+    parser.add_argument("--export-max", type=int, default=100000, help="largest size that is exported")
+    parser.add_argument("--pages", type=int, default=50, help="pages read when scrolling")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query (best and median are kept)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for import and PDF")
+    parser.add_argument("--dir", default=None, help="directory for the generated files (use a real disk)")
+    parser.add_argument("--out", default="benchmark-results.json", help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="previous JSON results to compare with")
+    args = parser.parse_args()
+
+    formats = [value for value in args.formats.split(",") if value]
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for rows in sorted({int(float(value)) for value in args.rows.split(",")}):
+            start = time.perf_counter()
+            paths = generate(os.path.join(directory, f"csv-{rows}"), rows, rows, rows)
+            print(f"rows={rows} generated in {time.perf_counter() - start:.2f}s", flush=True)
+            repo = LibraryRepository.open(os.path.join(directory, f"library-{rows}.db"))
+            run = {"rows": rows}
+            run["import"] = bench_import(repo, paths, rows, args.workers)
+            run["tree"] = bench_tree(repo, rows, args.pages, args.repeat)
+            run["export"] = (bench_export(repo, directory, rows, formats, args.workers)
+                             if rows <= args.export_max else {})
+            run["queries"] = bench_queries(repo, rows, args.repeat)
+            repo.close()
+            for file_path in paths.values():
+                os.remove(file_path)
+            results["runs"].append(run)
+            # Ghi lại sau mỗi kích thước để không mất kết quả nếu lần chạy lớn bị dừng giữa chừng
+            with open(args.out, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}", flush=True)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
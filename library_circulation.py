@@ -0,0 +1,85 @@
+from datetime import date
+
+from library_schema import to_iso_date
+
+
+# Lỗi nghiệp vụ khi mượn/trả sách (sách hết, thành viên không tồn tại, ...)
+class CirculationError(ValueError):
+    pass
+
+
+# Cập nhật các cột tóm tắt của thành viên sau khi khoản mượn đã được thêm/xoá trong bảng loans:
+# books_borrowed được dựng lại từ loans, quantity_borrowed tăng/giảm theo change
+def update_member_loans(conn, member_ref, change):
+    conn.execute('UPDATE members SET quantity_borrowed = MAX(COALESCE(quantity_borrowed, 0) + ?, 0), '
+                 "books_borrowed = (SELECT COALESCE(group_concat(title, ', '), '') FROM "
+                 '(SELECT title FROM loans WHERE member_ref = ? ORDER BY id)) '
+                 'WHERE id = ?', (change, member_ref, member_ref))
+
+
+# Mượn sách: thêm giao dịch và khoản mượn, giảm số sách còn lại, cập nhật số sách đang mượn của thành viên
+# Tất cả trong một giao dịch BEGIN IMMEDIATE nên nhiều máy cùng ghi vào library.db không làm lệch số liệu
+def checkout(repo, transaction_id, title, member_id, borrow_date, return_date):
+    borrow_iso = to_iso_date(borrow_date)
+    return_iso = to_iso_date(return_date)
+    if not transaction_id:
+        raise CirculationError("Transaction ID is required")
+    if borrow_iso is None or return_iso is None:
+        raise CirculationError("Dates must look like 13/06/2019")
+    if return_iso < borrow_iso:
+        raise CirculationError("Return date must not be before the borrow date")
+    conn = repo.conn
+    row = (transaction_id, title, member_id, borrow_date, return_date)
+    with repo.transaction(immediate=True):
+        book = conn.execute('SELECT id FROM books WHERE title = ?', (title,)).fetchone()
+        if book is None:
+            raise CirculationError(f"Book not found: {title}")
+        member = conn.execute('SELECT id FROM members WHERE member_id = ?', (member_id,)).fetchone()
+        if member is None:
+            raise CirculationError(f"Member not found: {member_id}")
+        # Điều kiện available > 0 nằm trong câu UPDATE nên số sách không bao giờ âm
+        if conn.execute('UPDATE books SET available = available - 1 WHERE id = ? AND available > 0',
+                        (book[0],)).rowcount == 0:
+            raise CirculationError(f"No copies of {title} are available")
+        transaction_ref = conn.execute(repo.insert_sql("transactions"),
+                                       repo.with_derived("transactions", row)).lastrowid
+        conn.execute('INSERT INTO loans (member_ref, book_ref, title, transaction_ref, due_date_iso) '
+                     'VALUES (?, ?, ?, ?, ?)', (member[0], book[0], title, transaction_ref, return_iso))
+        update_member_loans(conn, member[0], 1)
+
+
+# Trả sách: ghi ngày trả thực tế, xoá khoản mượn, tăng số sách còn lại và giảm số sách đang mượn của thành viên
+def return_book(repo, transaction_id, returned_on=None):
+    returned_iso = to_iso_date(returned_on) if returned_on else date.today().isoformat()
+    if returned_iso is None:
+        raise CirculationError("Dates must look like 13/06/2019")
+    conn = repo.conn
+    with repo.transaction(immediate=True):
+        transaction = conn.execute('SELECT id, book_id, book_ref, member_ref, returned_on FROM transactions '
+                                   'WHERE transaction_id = ?', (transaction_id,)).fetchone()
+        if transaction is None:
+            raise CirculationError(f"Transaction not found: {transaction_id}")
+        transaction_ref, title, book_ref, member_ref, already_returned = transaction
+        if already_returned:
+            raise CirculationError(f"Transaction {transaction_id} was already returned on {already_returned}")
+        conn.execute('UPDATE transactions SET returned_on = ? WHERE transaction_id = ?', (returned_iso, transaction_id))
+        # Sách hoặc thành viên có thể đã bị xoá (khoá ngoại NULL), khi đó không có gì để cập nhật
+        conn.execute('UPDATE books SET available = available + 1 WHERE id = ? AND available < quantity', (book_ref,))
+        # Khoản mượn của giao dịch này, hoặc (dữ liệu cũ chưa có liên kết) khoản mượn cùng tên sách của thành viên
+        loan = (conn.execute('SELECT id FROM loans WHERE transaction_ref = ?', (transaction_ref,)).fetchone()
+                or conn.execute('SELECT id FROM loans WHERE member_ref = ? AND title = ? ORDER BY id LIMIT 1',
+                                (member_ref, title)).fetchone())
+        # Số sách đang mượn chỉ giảm khi thực sự có khoản mượn bị xoá
+        if loan and conn.execute('DELETE FROM loans WHERE id = ?', (loan[0],)).rowcount > 0:
+            update_member_loans(conn, member_ref, -1)
+
+
+# Xoá giao dịch: giao dịch còn khoản mượn (sách chưa trả) không được xoá, nếu không số sách còn lại
+# và số sách đang mượn của thành viên sẽ lệch mãi vì không còn giao dịch để trả
+def delete_transaction(repo, transaction_id):
+    conn = repo.conn
+    with repo.transaction(immediate=True):
+        if conn.execute('SELECT 1 FROM transactions t JOIN loans l ON l.transaction_ref = t.id '
+                        'WHERE t.transaction_id = ?', (transaction_id,)).fetchone():
+            raise CirculationError(f"Transaction {transaction_id} is still open, return the book first")
+        conn.execute('DELETE FROM transactions WHERE transaction_id = ?', (transaction_id,))
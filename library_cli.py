@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from library_export import EXPORTERS, export_tables
+from library_import import IMPORT_MODES, CsvFormatError, import_csv
+from library_repository import DEFAULT_CHUNK_SIZE, DEFAULT_PROFILE, STORAGE_PROFILES, TABLES, LibraryRepository
+from library_schema import SEARCH_COLUMNS
+
+# Khoảng thời gian tối thiểu (giây) giữa hai dòng tiến độ được in ra
+PROGRESS_INTERVAL = 1.0
+
+# Các tuỳ chọn dòng lệnh mà từng định dạng xuất hỗ trợ
+EXPORT_OPTIONS = {
+    "sqlite": ["chunk_size"],
+    "excel": ["chunk_size"],
+    "word": [],
+    "pdf": ["workers"],
+}
+
+
+# Hàm báo tiến độ in ra stderr, tối đa một dòng mỗi PROGRESS_INTERVAL giây
+# Mỗi dòng kết thúc bằng xuống dòng nên phù hợp với file log của các tác vụ chạy đêm
+def progress_printer(label):
+    last = [0.0]
+
+    def progress(done, total=None):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        text = f"{label}: {done:,}/{total:,}" if total else f"{label}: {done:,} rows"
+        print(text, file=sys.stderr, flush=True)
+    return progress
+
+
+# Nhập một hoặc nhiều file CSV (bảng được nhận diện theo dòng tiêu đề như trên giao diện)
+def run_import(repo, args):
+    for file_path in args.files:
+        result = import_csv(repo, file_path, args.chunk_size, mode=args.mode,
+                            progress=progress_printer(f"Importing {os.path.basename(file_path)}"),
+                            workers=args.workers, reject_path=args.rejects)
+        print(f"{file_path}: {result}", flush=True)
+
+
+# Xuất các bảng đã chọn vào một file theo định dạng đã chọn
+def run_export(repo, args):
+    options = {name: getattr(args, name) for name in EXPORT_OPTIONS[args.format] if getattr(args, name)}
+    start = time.perf_counter()
+    export_tables(repo, args.format, args.file, args.tables, progress=progress_printer("Exporting"), **options)
+    print(f"Saved {', '.join(args.tables)} to {args.file} in {time.perf_counter() - start:.2f}s", flush=True)
+
+
+# Xoá toàn bộ dữ liệu của các bảng đã chọn
+def run_reset(repo, args):
+    if not args.yes:
+        print("error: reset deletes all rows of the selected tables, pass --yes to confirm", file=sys.stderr)
+        return 2
+    for table in args.tables:
+        repo.reset(table)
+        print(f"Reset {table}", flush=True)
+    return 0
+
+
+# In các số liệu thống kê (đọc từ các bảng tổng hợp) và số khoản mượn quá hạn
+def run_stats(repo, args):
+    totals, genres, top_titles = repo.statistics(args.top)
+    titles, copies, available, members, transactions, open_loans = totals
+    overdue = repo.count_overdue(date.today().isoformat())
+    if args.json:
+        print(json.dumps({
+            "titles": titles, "copies": copies, "available": available, "members": members,
+            "transactions": transactions, "open_loans": open_loans, "overdue": overdue,
+            "genres": [dict(zip(["genre", "titles", "copies", "available", "loans"], row)) for row in genres],
+            "top_titles": [{"title": title, "loans": loans} for title, loans in top_titles],
+        }, indent=2))
+        return
+    print(f"Titles: {titles:,}  Copies: {copies:,}  Available: {available:,}")
+    print(f"Members: {members:,}  Transactions: {transactions:,}  Open loans: {open_loans:,}  Overdue: {overdue:,}")
+    print("\nLoans per genre:")
+    for genre, genre_titles, genre_copies, genre_available, loans in genres:
+        print(f"  {genre or '(none)'}: {genre_titles:,} titles, {genre_copies:,} copies, "
+              f"{genre_available:,} available, {loans:,} loans")
+    print("\nTop borrowed titles:")
+    for title, loans in top_titles:
+        print(f"  {title}: {loans:,}")
+
+
+# Dọn dẹp file cơ sở dữ liệu: gộp các phân đoạn của chỉ mục FTS, VACUUM,
+# cập nhật thống kê cho bộ tối ưu truy vấn và thu gọn file WAL
+def run_vacuum(repo, args):
+    size = os.path.getsize(args.db)
+    with repo.transaction():
+        for table in SEARCH_COLUMNS:
+            repo.conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')")
+    repo.conn.execute('VACUUM')
+    repo.conn.execute('ANALYZE')
+    repo.conn.commit()
+    repo.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    print(f"Vacuumed {args.db}: {size:,} -> {os.path.getsize(args.db):,} bytes", flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Library Management System batch jobs (no GUI)")
+    parser.add_argument("--db", default="library.db", help="database file (default: library.db)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(STORAGE_PROFILES),
+                        help="SQLite storage profile")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per write/read chunk")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for CSV parsing and PDF rendering (default: automatic)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import CSV files (table detected from the header)")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument("--mode", choices=IMPORT_MODES, default="replace",
+                               help="replace the table or merge into it (default: replace)")
+    import_parser.add_argument("--rejects", default=None,
+                               help="file for invalid rows (default: next to each CSV file)")
+    import_parser.set_defaults(run=run_import)
+
+    export_parser = commands.add_parser("export", help="save tables to SQLite, Excel, Word or PDF")
+    export_parser.add_argument("format", choices=list(EXPORTERS))
+    export_parser.add_argument("file")
+    export_parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    export_parser.set_defaults(run=run_export)
+
+    reset_parser = commands.add_parser("reset", help="delete all rows of the selected tables")
+    reset_parser.add_argument("tables", nargs="+", choices=list(TABLES))
+    reset_parser.add_argument("--yes", action="store_true", help="confirm the reset")
+    reset_parser.set_defaults(run=run_reset)
+
+    stats_parser = commands.add_parser("stats", help="print library statistics")
+    stats_parser.add_argument("--top", type=int, default=10, help="number of top borrowed titles")
+    stats_parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    stats_parser.set_defaults(run=run_stats)
+
+    vacuum_parser = commands.add_parser("vacuum", help="compact the database and refresh query statistics")
+    vacuum_parser.set_defaults(run=run_vacuum)
+    return parser
+
+
+# Chạy lệnh đã chọn, trả về mã thoát (0: thành công)
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repo = None
+    try:
+        repo = LibraryRepository.open(args.db, args.profile)
+        return args.run(repo, args) or 0
+    except (CsvFormatError, ValueError, OSError, ImportError, sqlite3.Error) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if repo is not None:
+            repo.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
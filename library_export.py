@@ -0,0 +1,259 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+from library_import import IMPORT_HEADERS
+from library_pdf import render_report
+from library_repository import DEFAULT_CHUNK_SIZE, MIN_ROWID, TABLES, iter_chunks
+from library_schema import seed_statistics
+
+# Số trang cơ sở dữ liệu được chép trong mỗi bước của backup API
+BACKUP_PAGES_PER_STEP = 256
+
+# Số dòng tối đa của một sheet Excel (kể cả dòng tiêu đề)
+EXCEL_MAX_ROWS = 1048576
+
+# Các cột trỏ sang (hoặc chép từ) bảng khác (bảng -> {cột: bảng nguồn});
+# khi bảng nguồn không được xuất, cột được để NULL trong file đích
+EXPORT_REFERENCES = {
+    "transactions": {"book_ref": "books", "member_ref": "members"},
+    "loans": {"book_ref": "books", "transaction_ref": "transactions", "due_date_iso": "transactions"},
+}
+
+# Số dòng bảng Word được dựng XML và thêm vào tài liệu trong một lần
+WORD_BATCH_ROWS = 1000
+
+# Các ký tự điều khiển không hợp lệ trong XML
+XML_INVALID_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Tiêu đề của từng bảng trong file xuất ra
+TABLE_TITLES = {
+    "books": "Books Data",
+    "members": "Members Data",
+    "transactions": "Transactions Data",
+}
+
+
+# Xoá file đích (nếu có) để bản sao luôn được tạo mới
+def remove_file(file_path):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+# Lưu dạng SQLite
+# Chọn tất cả các bảng: chép nguyên file bằng backup API theo từng nhóm trang
+# Chỉ chọn một số bảng: ATTACH file đích và chép từng bảng bằng INSERT ... SELECT
+# progress(done, total) được gọi sau mỗi bước, có thể ném lỗi để huỷ giữa chừng
+def export_sqlite(repo, file_path, tables=None, progress=None, pages_per_step=BACKUP_PAGES_PER_STEP,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    tables = list(tables or TABLES)
+    for table in tables:
+        repo.table_spec(table)
+    remove_file(file_path)
+    try:
+        if set(tables) == set(TABLES):
+            backup_database(repo.conn, file_path, progress, pages_per_step)
+        else:
+            copy_tables(repo.conn, file_path, tables, progress, chunk_size)
+    except BaseException:
+        remove_file(file_path)
+        raise
+
+
+# Sao lưu trực tuyến toàn bộ cơ sở dữ liệu, mỗi bước chỉ chép pages_per_step trang
+# nên các kết nối khác vẫn có thể ghi xen giữa các bước
+def backup_database(conn, file_path, progress=None, pages_per_step=BACKUP_PAGES_PER_STEP):
+    def on_step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+
+    target = sqlite3.connect(file_path)
+    try:
+        conn.backup(target, pages=pages_per_step, progress=on_step)
+    finally:
+        target.close()
+
+
+# Tạo toàn bộ lược đồ (bảng, bảng FTS, chỉ mục, trigger) trong file đích đã ATTACH,
+# kể cả các bảng không được chọn, rồi đánh dấu cùng phiên bản lược đồ với file gốc
+# để khi mở lại file đích không phải chạy lại các bước nâng cấp (và không mất các cột mới)
+def copy_schema(conn):
+    entries = conn.execute(
+        "SELECT type, name, sql FROM main.sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid").fetchall()
+    virtual_tables = [name for _, name, sql in entries if sql.startswith("CREATE VIRTUAL TABLE")]
+    for entry_type, name, sql in entries:
+        # Các bảng phụ của bảng FTS được tạo tự động cùng bảng ảo
+        if entry_type == "table" and any(name.startswith(f"{virtual}_") for virtual in virtual_tables):
+            continue
+        conn.execute(re.sub(r'^(CREATE (?:UNIQUE |VIRTUAL )?(?:TABLE|INDEX|TRIGGER) )', r'\1export.', sql))
+    version = conn.execute('PRAGMA main.user_version').fetchone()[0]
+    conn.execute(f'PRAGMA export.user_version = {version}')
+
+
+# Chép các bảng được chọn sang file đích đã ATTACH (các trigger của file đích cập nhật chỉ mục FTS)
+# Việc chép diễn ra trong một giao dịch đọc nên dữ liệu nhất quán giữa các bảng
+# Các khoản đang mượn (loans) đi cùng bảng thành viên; các bảng tổng hợp được tính lại
+# từ dữ liệu đã chép để file chỉ chứa một phần các bảng vẫn có số liệu đúng
+def copy_tables(conn, file_path, tables, progress=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Khoá ngoại tới các bảng không được chọn sẽ không tồn tại trong file đích
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('ATTACH DATABASE ? AS export', (file_path,))
+    try:
+        conn.execute('BEGIN')
+        try:
+            copy_schema(conn)
+            tables = list(tables) + (["loans"] if "members" in tables else [])
+            total = sum(conn.execute(f'SELECT COUNT(*) FROM main.{table}').fetchone()[0] for table in tables)
+            done = 0
+            for table in tables:
+                after = MIN_ROWID
+                while True:
+                    last = conn.execute(f'SELECT MAX(rowid) FROM (SELECT rowid FROM main.{table} WHERE rowid > ? '
+                                        'ORDER BY rowid LIMIT ?)', (after, chunk_size)).fetchone()[0]
+                    if last is None:
+                        break
+                    cursor = conn.execute(f'INSERT INTO export.{table} SELECT * FROM main.{table} '
+                                          'WHERE rowid > ? AND rowid <= ?', (after, last))
+                    after = last
+                    done += cursor.rowcount
+                    if progress:
+                        progress(done, total)
+            for table, references in EXPORT_REFERENCES.items():
+                for column, parent in references.items():
+                    if table in tables and parent not in tables:
+                        conn.execute(f'UPDATE export.{table} SET {column} = NULL')
+            seed_statistics(conn, "export")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute('DETACH DATABASE export')
+        conn.execute('PRAGMA foreign_keys = ON')
+
+
+# Đọc các bảng trong cùng một giao dịch đọc để dữ liệu xuất ra nhất quán giữa các bảng
+@contextmanager
+def read_snapshot(repo):
+    repo.conn.execute('BEGIN')
+    try:
+        yield
+    finally:
+        # Giao dịch chỉ đọc nên kết thúc bằng rollback
+        repo.conn.rollback()
+
+
+# Lưu dạng Excel: một workbook, mỗi bảng một sheet
+# Dùng workbook write-only của openpyxl: các dòng được lấy từ cursor theo từng khối và ghi thẳng
+# ra file tạm, nên bộ nhớ không tăng theo kích thước bảng
+# Khi sheet đạt giới hạn số dòng của Excel, phần còn lại được ghi sang sheet mới
+def export_excel(repo, file_path, tables, progress=None, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=EXCEL_MAX_ROWS):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    with read_snapshot(repo):
+        total = sum(repo.count(table) for table in tables)
+        done = 0
+        for table in tables:
+            sheet = None
+            sheet_rows = max_rows
+            part = 0
+            for row in repo.iter_rows(table, chunk_size):
+                if sheet_rows >= max_rows:
+                    part += 1
+                    sheet = create_excel_sheet(workbook, table, part)
+                    sheet_rows = 1
+                sheet.append(row)
+                sheet_rows += 1
+                done += 1
+                if progress and done % chunk_size == 0:
+                    progress(done, total)
+            if sheet is None:
+                create_excel_sheet(workbook, table, 1)
+    workbook.save(file_path)
+    if progress:
+        progress(done, total)
+
+
+# Tạo sheet mới cho bảng (sheet thứ 2 trở đi có thêm số thứ tự) kèm dòng tiêu đề
+def create_excel_sheet(workbook, table, part):
+    title = table.capitalize() if part == 1 else f"{table.capitalize()} ({part})"
+    sheet = workbook.create_sheet(title)
+    sheet.append(IMPORT_HEADERS[table])
+    return sheet
+
+
+# Lưu dạng Word: một file docx, mỗi bảng một section bắt đầu ở trang mới
+def export_word(repo, file_path, tables, progress=None, batch_rows=WORD_BATCH_ROWS):
+    from docx import Document
+    doc = Document()
+    with read_snapshot(repo):
+        total = sum(repo.count(table) for table in tables)
+        done = 0
+        for index, table in enumerate(tables):
+            if index:
+                doc.add_section()
+            doc.add_heading(TABLE_TITLES[table], 0)
+            headers = IMPORT_HEADERS[table]
+            word_table = doc.add_table(rows=1, cols=len(headers))
+            for cell, header in zip(word_table.rows[0].cells, headers):
+                cell.text = header
+            cell_props = word_cell_props(word_table)
+            for rows in iter_chunks(repo.iter_rows(table), batch_rows):
+                append_word_rows(word_table, rows, cell_props)
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+    doc.save(file_path)
+
+
+# Thuộc tính ô (độ rộng cột) của dòng tiêu đề, được dùng lại cho các dòng dữ liệu
+def word_cell_props(word_table):
+    return [tc.tcPr.xml if tc.tcPr is not None else "" for tc in word_table._tbl.tr_lst[0].tc_lst]
+
+
+# Thêm nhiều dòng vào bảng Word bằng cách dựng XML của cả khối rồi gắn vào bảng một lần
+# (table.add_row().cells của python-docx duyệt lại toàn bộ bảng ở mỗi dòng nên chậm theo bình phương)
+def append_word_rows(word_table, rows, cell_props):
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    rows_xml = "".join(
+        "<w:tr>" + "".join(
+            f'<w:tc>{props}<w:p><w:r><w:t xml:space="preserve">{word_text(value)}</w:t></w:r></w:p></w:tc>'
+            for props, value in zip(cell_props, row)) + "</w:tr>"
+        for row in rows)
+    word_table._tbl.extend(list(parse_xml(f'<w:tbl {nsdecls("w")}>{rows_xml}</w:tbl>')))
+
+
+# Nội dung một ô Word (đã escape XML)
+def word_text(value):
+    return escape(XML_INVALID_CHARS.sub("", str(value)))
+
+
+# Lưu dạng PDF: một file pdf, mỗi bảng một chương dạng bảng có tiêu đề cột lặp lại ở mỗi trang
+# Bảng lớn được vẽ song song trên nhiều tiến trình (xem library_pdf)
+def export_pdf(repo, file_path, tables, progress=None, workers=None):
+    with read_snapshot(repo):
+        chapters = [(table, TABLE_TITLES[table], repo.iter_rows(table), repo.count(table)) for table in tables]
+        render_report(chapters, file_path, progress=progress, workers=workers)
+
+
+# Các định dạng lưu được hỗ trợ
+EXPORTERS = {
+    "sqlite": export_sqlite,
+    "excel": export_excel,
+    "word": export_word,
+    "pdf": export_pdf,
+}
+
+
+# Lưu các bảng đã chọn vào một file duy nhất theo định dạng đã chọn
+# options: các tham số riêng của từng định dạng (ví dụ chunk_size, workers)
+def export_tables(repo, format_selected, file_path, tables, progress=None, **options):
+    if format_selected not in EXPORTERS:
+        raise ValueError(f"Unknown save format: {format_selected}")
+    for table in tables:
+        repo.table_spec(table)
+    EXPORTERS[format_selected](repo, file_path, tables, progress=progress, **options)
@@ -0,0 +1,298 @@
+import csv
+import io
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from library_repository import DEFAULT_CHUNK_SIZE
+from library_schema import to_iso_date
+
+# Tiêu đề cột của các file CSV được hỗ trợ
+BOOK_HEADERS = ["Title", "Author", "Genre", "Quantity", "Available"]
+MEMBER_HEADERS = ["Member ID", "Name", "Membership Date", "Books Borrowed", "Quantity Borrowed"]
+TRANSACTION_HEADERS = ["Transaction ID", "Book ID", "Member ID", "Borrow Date", "Return Date"]
+
+# Các chế độ nhập: thay thế toàn bộ bảng, hoặc gộp vào dữ liệu hiện có theo khoá
+IMPORT_MODES = ["replace", "merge"]
+
+# Bảng mã của file CSV
+CSV_ENCODING = "utf-8"
+
+# Kích thước mỗi đoạn file được một tiến trình con đọc và kiểm tra,
+# và kích thước file tối thiểu để chia cho nhiều tiến trình
+RANGE_BYTES = 4 * 1024 * 1024
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# Ánh xạ bảng -> tiêu đề CSV
+IMPORT_HEADERS = {
+    "books": BOOK_HEADERS,
+    "members": MEMBER_HEADERS,
+    "transactions": TRANSACTION_HEADERS,
+}
+
+
+class CsvFormatError(ValueError):
+    pass
+
+
+# Kết quả của một lần nhập dữ liệu
+# Ở chế độ gộp có thêm số dòng được thêm, cập nhật và bỏ qua (không thay đổi)
+# Các dòng không hợp lệ không được nhập mà được ghi ra file reject_path
+class ImportResult:
+    def __init__(self, table, rows, seconds, inserted=None, updated=None, skipped=None):
+        self.table = table
+        self.rows = rows
+        self.seconds = seconds
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped
+        self.rejected = 0
+        self.reject_path = None
+
+    @property
+    def rows_per_sec(self):
+        if self.seconds <= 0:
+            return float(self.rows)
+        return self.rows / self.seconds
+
+    def __str__(self):
+        text = f"{self.rows} rows into {self.table} in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/s)"
+        if self.inserted is not None:
+            text += f"\n{self.inserted} inserted, {self.updated} updated, {self.skipped} unchanged"
+        if self.rejected:
+            text += f"\n{self.rejected} invalid rows written to {self.reject_path}"
+        return text
+
+
+# Tìm bảng tương ứng với dòng tiêu đề của file CSV
+def detect_table(headers):
+    for table, table_headers in IMPORT_HEADERS.items():
+        if headers == table_headers:
+            return table
+    return None
+
+
+# Số nguyên không âm trong một ô, báo lỗi kèm tên cột nếu không hợp lệ
+def parse_count(value, column):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{column} must be an integer: {value!r}") from None
+    if number < 0:
+        raise ValueError(f"{column} must not be negative: {value!r}")
+    return number
+
+
+# Ngày dạng d/m/Y (ví dụ 13/06/2019), giá trị gốc được giữ nguyên để hiển thị
+def parse_date(value, column):
+    if to_iso_date(value) is None:
+        raise ValueError(f"{column} must be a date like 13/06/2019: {value!r}")
+    return value
+
+
+# Kiểm tra và chuyển kiểu một dòng CSV, báo ValueError nếu dòng không hợp lệ
+def validate_row(table, row):
+    headers = IMPORT_HEADERS[table]
+    if len(row) != len(headers):
+        raise ValueError(f"Expected {len(headers)} columns, found {len(row)}")
+    if not row[0].strip():
+        raise ValueError(f"{headers[0]} must not be empty")
+    if table == "books":
+        title, author, genre, quantity, available = row
+        quantity = parse_count(quantity, "Quantity")
+        available = parse_count(available, "Available")
+        if available > quantity:
+            raise ValueError(f"Available ({available}) must not exceed Quantity ({quantity})")
+        return title, author, genre, quantity, available
+    if table == "members":
+        member_id, name, membership_date, books_borrowed, quantity_borrowed = row
+        return (member_id, name, parse_date(membership_date, "Membership Date"), books_borrowed,
+                parse_count(quantity_borrowed, "Quantity Borrowed"))
+    transaction_id, book_id, member_id, borrow_date, return_date = row
+    return (transaction_id, book_id, member_id, parse_date(borrow_date, "Borrow Date"),
+            parse_date(return_date, "Return Date"))
+
+
+# Ánh xạ file vào bộ nhớ (chỉ đọc): các trang của file được hệ điều hành nạp khi cần,
+# không phải đọc vào bộ đệm riêng của chương trình
+# File rỗng không ánh xạ được nên trả về bytes rỗng
+@contextmanager
+def map_file(file_path):
+    with open(file_path, 'rb') as csvfile:
+        if os.fstat(csvfile.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+# Vị trí ngay sau ký tự xuống dòng đầu tiên tính từ pos (hoặc cuối file)
+def line_end(data, pos):
+    newline = data.find(b"\n", pos)
+    return len(data) if newline < 0 else newline + 1
+
+
+# Đọc dòng tiêu đề mà không đọc phần còn lại của file,
+# trả về (tiêu đề, vị trí byte bắt đầu phần dữ liệu)
+def read_header(file_path):
+    with map_file(file_path) as data:
+        end = line_end(data, 0)
+        line = data[:end].decode(CSV_ENCODING, errors="replace").lstrip("\ufeff")
+    return next(csv.reader([line]), None), end
+
+
+# Chia phần dữ liệu của file thành các đoạn byte, mỗi đoạn kết thúc ở cuối một dòng
+# (giá trị có xuống dòng bên trong dấu ngoặc kép sẽ bị tách và được ghi vào file lỗi)
+def split_ranges(file_path, start, range_bytes=RANGE_BYTES):
+    ranges = []
+    with map_file(file_path) as data:
+        while start < len(data):
+            end = line_end(data, min(start + range_bytes, len(data)))
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+# Giải mã một đoạn byte của file đã ánh xạ, đọc thẳng từ bộ nhớ ánh xạ qua memoryview
+# (không tạo bản sao bytes trung gian)
+def decode_range(file_path, start, end):
+    with map_file(file_path) as data:
+        view = memoryview(data)[start:end]
+        try:
+            return str(view, CSV_ENCODING, "replace")
+        finally:
+            view.release()
+
+
+# Chạy trong tiến trình con: đọc và kiểm tra một đoạn byte của file CSV
+# Trả về (các dòng hợp lệ, các dòng lỗi dạng (số dòng trong đoạn, dòng, lỗi), số dòng của đoạn)
+def parse_range(task):
+    file_path, table, start, end = task
+    reader = csv.reader(io.StringIO(decode_range(file_path, start, end), newline=''))
+    rows = []
+    rejects = []
+    for row in reader:
+        # Bỏ qua các dòng trống
+        if not row:
+            continue
+        try:
+            rows.append(validate_row(table, row))
+        except ValueError as e:
+            rejects.append((reader.line_num, row, str(e)))
+    return rows, rejects, reader.line_num
+
+
+# Ghi các dòng không hợp lệ ra file CSV (tạo file khi gặp dòng lỗi đầu tiên)
+# Mỗi dòng gồm số dòng trong file gốc, lỗi và nội dung gốc
+class RejectWriter:
+    def __init__(self, file_path, headers):
+        self.file_path = file_path
+        self.headers = headers
+        self.count = 0
+        self.file = None
+        self.writer = None
+        # Xoá file lỗi của lần nhập trước để không bị nhầm với kết quả lần này
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    def write(self, line, row, error):
+        if self.file is None:
+            self.file = open(self.file_path, 'w', newline='', encoding=CSV_ENCODING)
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["Line", "Error"] + self.headers)
+        self.writer.writerow([line, error] + row)
+        self.count += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+# Đường dẫn mặc định của file lỗi: books.csv -> books.rejects.csv
+def reject_path_for(file_path):
+    return f"{os.path.splitext(file_path)[0]}.rejects.csv"
+
+
+# Đọc và kiểm tra file theo từng đoạn byte, trả về các dòng hợp lệ theo đúng thứ tự trong file
+# File lớn được chia cho nhiều tiến trình con, kết quả được ghép lại theo thứ tự
+# rồi chuyển cho một luồng ghi SQLite duy nhất (hàm gọi generator này)
+def iter_validated(file_path, table, start, rejects, workers=None, range_bytes=RANGE_BYTES):
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(file_path, start, range_bytes)
+    # Dòng 1 là dòng tiêu đề
+    line = 1
+
+    def accept(result):
+        nonlocal line
+        rows, bad_rows, lines = result
+        for local_line, row, error in bad_rows:
+            rejects.write(line + local_line, row, error)
+        line += lines
+        return rows
+
+    if workers <= 1 or len(ranges) < 2 or os.path.getsize(file_path) < PARALLEL_MIN_BYTES:
+        for range_start, range_end in ranges:
+            yield from accept(parse_range((file_path, table, range_start, range_end)))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for range_start, range_end in ranges:
+                pending.append(executor.submit(parse_range, (file_path, table, range_start, range_end)))
+                # Giới hạn số đoạn đang chờ để bộ nhớ không tăng theo kích thước file
+                if len(pending) > 2 * workers:
+                    yield from accept(pending.popleft().result())
+            while pending:
+                yield from accept(pending.popleft().result())
+        finally:
+            # Dừng sớm (lỗi hoặc huỷ): bỏ các đoạn chưa chạy
+            for future in pending:
+                future.cancel()
+
+
+# Ghi các dòng vào bảng theo từng khối bằng executemany, tất cả trong một giao dịch
+# Nếu có lỗi giữa chừng thì toàn bộ thay đổi được rollback
+def insert_rows(repo, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, replace=True, progress=None):
+    start = time.perf_counter()
+    count = repo.insert(table, rows, chunk_size, replace, progress)
+    return ImportResult(table, count, time.perf_counter() - start)
+
+
+# Gộp các dòng vào bảng theo khoá (upsert), chỉ các dòng mới hoặc thay đổi được ghi
+def merge_rows(repo, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    start = time.perf_counter()
+    inserted, updated, skipped = repo.merge(table, rows, chunk_size, progress)
+    return ImportResult(table, inserted + updated + skipped, time.perf_counter() - start,
+                        inserted, updated, skipped)
+
+
+# Nhập một file CSV vào cơ sở dữ liệu, bảng đích được xác định từ dòng tiêu đề
+# mode: "replace" xoá dữ liệu cũ của bảng, "merge" gộp vào dữ liệu hiện có
+# Các dòng được kiểm tra song song (workers tiến trình), dòng lỗi được ghi ra reject_path
+def import_csv(repo, file_path, chunk_size=DEFAULT_CHUNK_SIZE, mode="replace", progress=None, workers=None,
+               reject_path=None):
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+    headers, start = read_header(file_path)
+    if not headers:
+        raise CsvFormatError("No data found in the selected file")
+    table = detect_table(headers)
+    if table is None:
+        raise CsvFormatError("Invalid data format in the selected file")
+    rejects = RejectWriter(reject_path or reject_path_for(file_path), headers)
+    rows = iter_validated(file_path, table, start, rejects, workers)
+    try:
+        if mode == "merge":
+            result = merge_rows(repo, table, rows, chunk_size, progress)
+        else:
+            result = insert_rows(repo, table, rows, chunk_size, True, progress)
+    finally:
+        rows.close()
+        rejects.close()
+    result.rejected = rejects.count
+    if rejects.count:
+        result.reject_path = rejects.file_path
+    return result
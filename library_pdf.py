@@ -0,0 +1,195 @@
+import importlib.util
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from library_import import IMPORT_HEADERS
+
+# Bố cục trang báo cáo (đơn vị mm, khổ A4 dọc)
+MARGIN = 10
+TITLE_HEIGHT = 10
+HEADER_HEIGHT = 8
+ROW_HEIGHT = 7
+FONT_SIZE = 9
+
+# Tỉ lệ độ rộng các cột của từng bảng
+COLUMN_WEIGHTS = {
+    "books": [3, 2, 2, 1, 1],
+    "members": [1.2, 2, 1.5, 3, 1.3],
+    "transactions": [1.5, 1.5, 1.2, 1.2, 1.2],
+}
+
+# Số trang mỗi tiến trình con vẽ trong một lần, và số dòng tối thiểu để vẽ song song
+PAGES_PER_CHUNK = 50
+PARALLEL_MIN_ROWS = 20000
+
+
+# Font mặc định của PDF chỉ hỗ trợ latin-1, các ký tự khác được thay bằng "?"
+def pdf_text(value):
+    return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+
+# Tạo đối tượng PDF có tiêu đề và dòng tiêu đề cột được lặp lại ở đầu mỗi trang
+# page_offset: số trang đứng trước phần này (dùng khi ghép các phần vẽ song song)
+def create_report(page_offset=0):
+    from fpdf import FPDF
+
+    class TableReport(FPDF):
+        def header(self):
+            if not self.report_table:
+                return
+            self.set_font("Arial", "B", 14)
+            self.cell(0, TITLE_HEIGHT, txt=self.report_title, ln=1, align='C')
+            self.set_font("Arial", "B", FONT_SIZE + 1)
+            self.set_fill_color(220, 220, 220)
+            for width, header in zip(self.column_widths, IMPORT_HEADERS[self.report_table]):
+                self.cell(width, HEADER_HEIGHT, txt=header, border=1, align='C', fill=True)
+            self.ln(HEADER_HEIGHT)
+            self.set_font("Arial", size=FONT_SIZE)
+
+        def footer(self):
+            self.set_y(-MARGIN)
+            self.set_font("Arial", "I", 8)
+            self.cell(0, MARGIN / 2, txt=f"Page {self.page_offset + self.page_no()}", align='C')
+
+    pdf = TableReport()
+    pdf.set_margins(MARGIN, MARGIN, MARGIN)
+    # Ngắt trang được điều khiển thủ công để số dòng mỗi trang luôn cố định
+    pdf.set_auto_page_break(False)
+    pdf.page_offset = page_offset
+    pdf.report_table = None
+    pdf.report_title = ""
+    pdf.column_widths = []
+    return pdf
+
+
+# Số dòng dữ liệu vừa một trang
+def rows_per_page(pdf):
+    usable = pdf.h - 2 * MARGIN - MARGIN / 2 - TITLE_HEIGHT - HEADER_HEIGHT
+    return int(usable // ROW_HEIGHT)
+
+
+# Bắt đầu một chương mới cho bảng (chưa thêm trang)
+def start_chapter(pdf, table, title):
+    weights = COLUMN_WEIGHTS[table]
+    usable_width = pdf.w - 2 * MARGIN
+    pdf.report_table = table
+    pdf.report_title = pdf_text(title)
+    pdf.column_widths = [usable_width * weight / sum(weights) for weight in weights]
+
+
+# Cắt bớt nội dung để vừa độ rộng ô
+def fit_text(pdf, text, width):
+    if pdf.get_string_width(text) <= width - 2:
+        return text
+    while text and pdf.get_string_width(text + "...") > width - 2:
+        text = text[:-1]
+    return text + "..."
+
+
+# Vẽ các dòng của bảng, tự thêm trang mới khi trang hiện tại đã đủ dòng, trả về số trang đã thêm
+def write_rows(pdf, rows):
+    per_page = rows_per_page(pdf)
+    pages = 0
+    for index, row in enumerate(rows):
+        if index % per_page == 0:
+            pdf.add_page()
+            pages += 1
+        for width, value in zip(pdf.column_widths, row):
+            pdf.cell(width, ROW_HEIGHT, txt=fit_text(pdf, pdf_text(value), width), border=1)
+        pdf.ln(ROW_HEIGHT)
+    if pages == 0:
+        pdf.add_page()
+        pages = 1
+    return pages
+
+
+# Lấy nội dung PDF dạng bytes (tương thích cả fpdf và fpdf2)
+def pdf_bytes(pdf):
+    data = pdf.output(dest='S')
+    return data.encode('latin-1') if isinstance(data, str) else bytes(data)
+
+
+# Chạy trong tiến trình con: vẽ một đoạn các trang liên tiếp của một bảng
+def render_chunk(task):
+    table, title, rows, page_offset = task
+    pdf = create_report(page_offset)
+    start_chapter(pdf, table, title)
+    write_rows(pdf, rows)
+    return pdf_bytes(pdf)
+
+
+# Số trang của báo cáo (mỗi chương ít nhất một trang)
+def count_pages(chapters, per_page):
+    return sum(max(1, -(-count // per_page)) for _, _, _, count in chapters)
+
+
+# Vẽ tuần tự toàn bộ báo cáo trong một đối tượng PDF
+def render_serial(chapters, file_path, progress=None):
+    pdf = create_report()
+    total_pages = count_pages(chapters, rows_per_page(pdf))
+    pages = 0
+    for table, title, rows, _ in chapters:
+        start_chapter(pdf, table, title)
+        pages += write_rows(pdf, rows)
+        if progress:
+            progress(pages, total_pages)
+    pdf.output(file_path)
+    return pages
+
+
+# Vẽ song song: mỗi bảng được chia thành các đoạn PAGES_PER_CHUNK trang,
+# các tiến trình con vẽ từng đoạn, sau đó các phần được ghép lại theo thứ tự
+def render_parallel(chapters, file_path, workers, progress=None):
+    from pypdf import PdfReader, PdfWriter
+    per_page = rows_per_page(create_report())
+    chunk_rows = per_page * PAGES_PER_CHUNK
+    total_pages = count_pages(chapters, per_page)
+    writer = PdfWriter()
+    pages = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+
+        # Ghép phần đã vẽ xong đầu tiên vào file kết quả
+        def merge_next():
+            nonlocal pages
+            part = pending.pop(0).result()
+            reader = PdfReader(io.BytesIO(part))
+            for page in reader.pages:
+                writer.add_page(page)
+            pages += len(reader.pages)
+            if progress:
+                progress(pages, total_pages)
+
+        page_offset = 0
+        for table, title, rows, _ in chapters:
+            chunk = []
+            chunks = 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunk_rows:
+                    pending.append(executor.submit(render_chunk, (table, title, chunk, page_offset)))
+                    page_offset += PAGES_PER_CHUNK
+                    chunk = []
+                    chunks += 1
+                    # Giới hạn số đoạn đang chờ để bộ nhớ không tăng theo kích thước bảng
+                    while len(pending) > 2 * workers:
+                        merge_next()
+            if chunk or chunks == 0:
+                pending.append(executor.submit(render_chunk, (table, title, chunk, page_offset)))
+                page_offset += max(1, -(-len(chunk) // per_page))
+        while pending:
+            merge_next()
+    with open(file_path, "wb") as output:
+        writer.write(output)
+    return pages
+
+
+# Vẽ báo cáo PDF từ danh sách chương (bảng, tiêu đề, các dòng, số dòng), trả về số trang
+# Báo cáo lớn được vẽ song song bằng nhiều tiến trình khi có thư viện pypdf để ghép file
+def render_report(chapters, file_path, progress=None, workers=None):
+    workers = workers or os.cpu_count() or 1
+    total_rows = sum(count for _, _, _, count in chapters)
+    if workers > 1 and total_rows >= PARALLEL_MIN_ROWS and importlib.util.find_spec("pypdf"):
+        return render_parallel(chapters, file_path, workers, progress)
+    return render_serial(chapters, file_path, progress)
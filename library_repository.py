@@ -0,0 +1,595 @@
+import re
+import sqlite3
+from collections import Counter
+from contextlib import contextmanager
+
+from library_schema import create_search_triggers, drop_search_triggers, migrate, split_titles, to_iso_date
+
+# Mô tả các bảng: khoá chính (tự nhiên) và các cột theo thứ tự hiển thị
+TABLES = {
+    "books": ("title", ["title", "author", "genre", "quantity", "available"]),
+    "members": ("member_id", ["member_id", "name", "membership_date", "books_borrowed", "quantity_borrowed"]),
+    "transactions": ("transaction_id", ["transaction_id", "book_id", "member_id", "borrow_date", "return_date"]),
+}
+
+# Các cột phụ được tính từ cột hiển thị khi ghi dữ liệu:
+# (tên cột, biểu thức SQL, vị trí cột nguồn, hàm chuyển đổi)
+DERIVED_COLUMNS = {
+    "books": [],
+    "members": [
+        ("membership_date_iso", "?", 2, to_iso_date),
+    ],
+    "transactions": [
+        ("borrow_date_iso", "?", 3, to_iso_date),
+        ("return_date_iso", "?", 4, to_iso_date),
+        ("book_ref", "(SELECT id FROM books WHERE title = ?)", 1, None),
+        ("member_ref", "(SELECT id FROM members WHERE member_id = ?)", 2, None),
+    ],
+}
+
+# Các cột có thể sắp xếp và lọc: cột hiển thị -> (biểu thức SQL dùng để so sánh, kiểu giá trị)
+# Cột ngày được so sánh qua cột ISO-8601 tương ứng, mỗi biểu thức đều có chỉ mục riêng
+SORT_COLUMNS = {
+    "books": {
+        "title": ("title", "text"),
+        "author": ("author", "text"),
+        "genre": ("genre", "text"),
+        "quantity": ("quantity", "number"),
+        "available": ("available", "number"),
+    },
+    "members": {
+        "member_id": ("member_id", "text"),
+        "name": ("name", "text"),
+        "membership_date": ("membership_date_iso", "date"),
+        "quantity_borrowed": ("quantity_borrowed", "number"),
+    },
+    "transactions": {
+        "transaction_id": ("transaction_id", "text"),
+        "book_id": ("book_id", "text"),
+        "member_id": ("member_id", "text"),
+        "borrow_date": ("borrow_date_iso", "date"),
+        "return_date": ("return_date_iso", "date"),
+    },
+}
+
+# Bộ lọc theo cột: toán tử so sánh (tuỳ chọn) và giá trị, ví dụ "Tol", ">= 3", "< 01/01/2020"
+FILTER_PATTERN = re.compile(r'^\s*(<=|>=|<>|!=|<|>|=)?\s*(.*?)\s*$', re.DOTALL)
+
+# Số dòng mặc định của một trang và của một khối ghi
+PAGE_SIZE = 100
+DEFAULT_CHUNK_SIZE = 5000
+MIN_ROWID = -2 ** 63
+MAX_ROWID = 2 ** 63 - 1
+
+# Cấu hình lưu trữ của kết nối SQLite (các PRAGMA được đặt ngay sau khi mở kết nối)
+# "default": các giá trị mặc định của SQLite (rollback journal, synchronous=FULL, bộ đệm ~2MB, không mmap)
+# "tuned": WAL (đọc không bị chặn khi đang ghi), synchronous=NORMAL (với WAL không hỏng dữ liệu,
+#          chỉ có thể mất giao dịch cuối khi mất điện), bộ đệm 64MB, mmap 256MB, bảng tạm trong RAM
+STORAGE_PROFILES = {
+    "default": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_PROFILE = "tuned"
+
+# Thời gian (giây) chờ khi file đang bị kết nối khác khoá ghi, trước khi báo "database is locked"
+BUSY_TIMEOUT = 10
+
+# Số kết quả tìm kiếm tối đa được trả về, và số dòng khớp tốt nhất được giữ lại để sắp xếp/lọc tiếp
+# (từ khoá quá phổ biến khớp với gần hết bảng, sắp xếp và lọc toàn bộ sẽ chậm)
+SEARCH_LIMIT = 1000
+SEARCH_CANDIDATES = 20000
+
+
+# Gom các dòng thành từng khối có kích thước cố định
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Mở kết nối SQLite và áp dụng cấu hình lưu trữ
+def connect(path, profile=DEFAULT_PROFILE):
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    # journal_mode phải được đặt trước, các PRAGMA còn lại chỉ có tác dụng với kết nối này
+    for name, value in STORAGE_PROFILES[profile].items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+# Chuyển chuỗi người dùng gõ thành truy vấn FTS5, các từ nối bằng AND
+# Từ cuối cùng đang được gõ dở nên được tìm theo tiền tố, các từ trước đó phải khớp nguyên từ
+# Dấu câu và ký tự đặc biệt của cú pháp FTS5 bị bỏ qua nên truy vấn luôn hợp lệ
+def search_query(text):
+    words = [f'"{word}"' for word in re.findall(r'\w+', text)]
+    if words and text[-1:].isalnum():
+        words[-1] += "*"
+    return " ".join(words)
+
+
+# Chuyển bộ lọc người dùng gõ cho một cột thành (điều kiện SQL, tham số)
+# Văn bản không có toán tử được lọc theo tiền tố, viết dưới dạng khoảng để dùng được chỉ mục
+# Số và ngày không có toán tử được so sánh bằng
+def column_filter(expression, kind, text):
+    operator, value = FILTER_PATTERN.match(text).groups()
+    if kind == "number":
+        try:
+            value = float(value) if "." in value else int(value)
+        except ValueError:
+            raise ValueError(f"Not a number: {value}") from None
+    elif kind == "date":
+        iso_value = to_iso_date(value)
+        if iso_value is None:
+            raise ValueError(f"Dates must look like 13/06/2019: {value}")
+        value = iso_value
+    elif operator is None:
+        return f'{expression} >= ? AND {expression} < ?', [value, value + "\U0010ffff"]
+    operator = "<>" if operator == "!=" else operator or "="
+    return f'{expression} {operator} ?', [value]
+
+
+# Lớp truy cập dữ liệu không phụ thuộc giao diện Tk
+# Có thể dùng trong các tác vụ nền, script hoặc cron job
+class LibraryRepository:
+    def __init__(self, conn):
+        self.conn = conn
+        # True khi các thao tác ghi đang được gom vào một giao dịch chung (group commit)
+        self.grouping = False
+
+    # Mở (hoặc tạo mới) file cơ sở dữ liệu và nâng cấp lược đồ nếu cần
+    @classmethod
+    def open(cls, path='library.db', profile=DEFAULT_PROFILE):
+        repo = cls(connect(path, profile))
+        repo.ensure_schema()
+        return repo
+
+    def close(self):
+        self.conn.close()
+
+    # Tạo bảng hoặc nâng cấp file cơ sở dữ liệu cũ lên lược đồ mới nhất
+    def ensure_schema(self):
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        migrate(self.conn)
+
+    # Giao dịch của một thao tác ghi: tự commit khi xong, rollback khi có lỗi
+    # immediate=True: giữ khoá ghi ngay từ đầu (BEGIN IMMEDIATE) để dữ liệu vừa đọc
+    # không bị kết nối khác sửa trước khi ghi (đọc - kiểm tra - ghi)
+    # Khi đang gom commit, thao tác chạy trong một SAVEPOINT của giao dịch chung:
+    # lỗi chỉ huỷ thay đổi của thao tác đó, việc commit do hàm end_group thực hiện
+    @contextmanager
+    def transaction(self, immediate=False):
+        if not self.grouping:
+            if immediate:
+                self.conn.execute('BEGIN IMMEDIATE')
+            with self.conn:
+                yield
+            return
+        self.conn.execute('SAVEPOINT write_op')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK TO write_op')
+            self.conn.execute('RELEASE write_op')
+            raise
+        self.conn.execute('RELEASE write_op')
+
+    # Bắt đầu gom các thao tác ghi vào một giao dịch (một lần ghi đĩa cho cả nhóm)
+    # Giao dịch giữ khoá ghi ngay từ đầu nên các thao tác trong nhóm cũng được cô lập như immediate
+    def begin_group(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.grouping = True
+
+    # Kết thúc nhóm: commit (hoặc rollback) giao dịch chung
+    def end_group(self, commit=True):
+        self.grouping = False
+        if commit:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+    # Trả về (khoá, danh sách cột) của bảng, báo lỗi nếu tên bảng không hợp lệ
+    def table_spec(self, table):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        return TABLES[table]
+
+    def columns(self, table):
+        return ", ".join(self.table_spec(table)[1])
+
+    # Biểu thức SQL và kiểu giá trị của một cột có thể sắp xếp/lọc
+    def sort_column(self, table, column):
+        self.table_spec(table)
+        if column not in SORT_COLUMNS[table]:
+            raise ValueError(f"Cannot sort or filter by {column}")
+        return SORT_COLUMNS[table][column]
+
+    # Các điều kiện WHERE của bộ lọc theo cột ({cột: chuỗi lọc}), bỏ qua các chuỗi rỗng
+    def filter_clauses(self, table, filters):
+        clauses, params = [], []
+        for column, text in (filters or {}).items():
+            if text.strip():
+                clause, values = column_filter(*self.sort_column(table, column), text)
+                clauses.append(clause)
+                params.extend(values)
+        return clauses, params
+
+    # Đếm số dòng của bảng (chỉ các dòng thoả bộ lọc nếu có)
+    def count(self, table, filters=None):
+        self.table_spec(table)
+        clauses, params = self.filter_clauses(table, filters)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        return self.conn.execute(f'SELECT COUNT(*) FROM {table}{where}', params).fetchone()[0]
+
+    # Lấy một dòng theo khoá
+    def get(self, table, key):
+        rows = self.get_many(table, [key])
+        return rows[0] if rows else None
+
+    # Lấy nhiều dòng theo danh sách khoá
+    def get_many(self, table, keys, chunk_size=500):
+        key, _ = self.table_spec(table)
+        rows = []
+        for chunk in iter_chunks(keys, chunk_size):
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(self.conn.execute(
+                f'SELECT {self.columns(table)} FROM {table} WHERE {key} IN ({placeholders})', chunk).fetchall())
+        return rows
+
+    # Duyệt toàn bộ bảng theo từng khối, không nạp tất cả vào bộ nhớ
+    def iter_rows(self, table, chunk_size=DEFAULT_CHUNK_SIZE):
+        cursor = self.conn.execute(f'SELECT {self.columns(table)} FROM {table} ORDER BY rowid')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+    # Lấy một trang theo rowid (keyset pagination), mỗi dòng bắt đầu bằng rowid
+    def page(self, table, after=MIN_ROWID, limit=PAGE_SIZE):
+        return self.conn.execute(
+            f'SELECT rowid, {self.columns(table)} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+            (after, limit)).fetchall()
+
+    # rowid đứng ngay trước vị trí offset (dùng để nhảy tới một trang bất kỳ)
+    def rowid_before(self, table, offset):
+        self.table_spec(table)
+        if offset <= 0:
+            return MIN_ROWID
+        row = self.conn.execute(f'SELECT rowid FROM {table} ORDER BY rowid LIMIT 1 OFFSET ?',
+                                (offset - 1,)).fetchone()
+        return row[0] if row else MAX_ROWID
+
+    # Lấy một trang theo thứ tự sắp xếp và bộ lọc (keyset pagination), mỗi dòng bắt đầu bằng rowid
+    # order: (cột, giảm dần) hoặc None (theo rowid); after: khoá của dòng cuối trang trước (None: từ đầu)
+    # Trả về (các dòng, khoá của dòng cuối) - khoá là rowid khi không sắp xếp, (giá trị, rowid) khi sắp xếp
+    def view_page(self, table, after=None, limit=PAGE_SIZE, order=None, filters=None):
+        clauses, params = self.filter_clauses(table, filters)
+        select = f'SELECT rowid, {self.columns(table)}'
+        if order is None:
+            where = " AND ".join(["rowid > ?"] + clauses)
+            rows = self.conn.execute(f'{select} FROM {table} WHERE {where} ORDER BY rowid LIMIT ?',
+                                     [MIN_ROWID if after is None else after] + params + [limit]).fetchall()
+            return rows, rows[-1][0] if rows else after
+        column, descending = order
+        expression, _ = self.sort_column(table, column)
+        direction, compare = ("DESC", "<") if descending else ("ASC", ">")
+        # Dòng có giá trị NULL đứng đầu khi tăng dần, cuối khi giảm dần (giống ORDER BY của SQLite),
+        # mỗi phần được đọc bằng một truy vấn riêng để điều kiện keyset luôn dùng được chỉ mục
+        segments = [
+            ("null", f'{expression} IS NULL', f'rowid {direction}'),
+            ("value", f'{expression} IS NOT NULL', f'{expression} {direction}, rowid {direction}'),
+        ]
+        if descending:
+            segments.reverse()
+        if after is not None:
+            current = "null" if after[0] is None else "value"
+            segments = segments[[name for name, _, _ in segments].index(current):]
+        rows = []
+        for name, condition, order_by in segments:
+            segment_params = []
+            if after is not None and name == current:
+                if name == "null":
+                    condition = f'{condition} AND rowid {compare} ?'
+                    segment_params = [after[1]]
+                else:
+                    condition = f'({expression}, rowid) {compare} (?, ?)'
+                    segment_params = list(after)
+            where = " AND ".join([condition] + clauses)
+            rows.extend(self.conn.execute(
+                f'{select}, {expression} FROM {table} WHERE {where} ORDER BY {order_by} LIMIT ?',
+                segment_params + params + [limit - len(rows)]).fetchall())
+            if len(rows) >= limit:
+                break
+        if not rows:
+            return [], after
+        return [row[:-1] for row in rows], (rows[-1][-1], rows[-1][0])
+
+    # Khoá của dòng đứng ngay trước vị trí offset theo thứ tự và bộ lọc (để nhảy tới một trang bất kỳ)
+    # Duyệt chỉ mục của cột sắp xếp nên không phải đọc các dòng dữ liệu
+    def key_before(self, table, offset, order=None, filters=None):
+        if offset <= 0:
+            return None
+        clauses, params = self.filter_clauses(table, filters)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        if order is None:
+            row = self.conn.execute(f'SELECT rowid FROM {table}{where} ORDER BY rowid LIMIT 1 OFFSET ?',
+                                    params + [offset - 1]).fetchone()
+            return row[0] if row else MAX_ROWID
+        column, descending = order
+        expression, _ = self.sort_column(table, column)
+        direction = "DESC" if descending else "ASC"
+        row = self.conn.execute(f'SELECT {expression}, rowid FROM {table}{where} '
+                                f'ORDER BY {expression} {direction}, rowid {direction} LIMIT 1 OFFSET ?',
+                                params + [offset - 1]).fetchone()
+        if row is None:
+            # Vượt quá cuối bảng: khoá của dòng cuối cùng (trang tiếp theo rỗng)
+            reverse = "ASC" if descending else "DESC"
+            row = self.conn.execute(f'SELECT {expression}, rowid FROM {table}{where} '
+                                    f'ORDER BY {expression} {reverse}, rowid {reverse} LIMIT 1', params).fetchone()
+        return tuple(row) if row else None
+
+    # Tìm kiếm toàn văn (chỉ mục FTS5), kết quả xếp theo độ liên quan (bm25)
+    # FTS5 chỉ giữ các dòng có điểm tốt nhất (ORDER BY rank LIMIT trong truy vấn FTS): limit dòng khi xếp
+    # theo độ liên quan, hoặc candidates dòng khi có order/filters (xem view_page) được áp dụng sau đó
+    # Mỗi dòng bắt đầu bằng rowid giống như page()
+    def search(self, table, text, limit=SEARCH_LIMIT, candidates=SEARCH_CANDIDATES, order=None, filters=None):
+        _, columns = self.table_spec(table)
+        query = search_query(text)
+        if not query:
+            return []
+        names = ", ".join(f"t.{column}" for column in columns)
+        clauses, params = self.filter_clauses(table, filters)
+        where = f'WHERE {" AND ".join(clauses)} ' if clauses else ''
+        order_by = 'matches.rank'
+        if order is None and not clauses:
+            candidates = limit
+        if order is not None:
+            column, descending = order
+            direction = "DESC" if descending else "ASC"
+            order_by = f't.{self.sort_column(table, column)[0]} {direction}, matches.rank'
+        return self.conn.execute(
+            f'SELECT t.rowid, {names} FROM '
+            f'(SELECT rowid, rank FROM {table}_fts WHERE {table}_fts MATCH ? ORDER BY rank LIMIT ?) AS matches '
+            f'JOIN {table} t ON t.rowid = matches.rowid {where}ORDER BY {order_by} LIMIT ?',
+            [query, candidates] + params + [limit]).fetchall()
+
+    # Thêm giá trị của các cột phụ (ngày ISO, khoá ngoại) vào sau các cột hiển thị
+    def with_derived(self, table, row):
+        derived = tuple(convert(row[index]) if convert else row[index]
+                        for _, _, index, convert in DERIVED_COLUMNS[table])
+        return tuple(row) + derived
+
+    # Câu lệnh INSERT gồm cả các cột phụ
+    def insert_sql(self, table):
+        _, columns = self.table_spec(table)
+        derived = DERIVED_COLUMNS[table]
+        names = columns + [name for name, _, _, _ in derived]
+        values = ["?"] * len(columns) + [expression for _, expression, _, _ in derived]
+        return f'INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join(values)})'
+
+    # Câu lệnh upsert: dòng có khoá mới được thêm, dòng trùng khoá được cập nhật
+    # nhưng chỉ khi nội dung khác dữ liệu hiện có (dòng giống hệt không bị ghi lại)
+    def upsert_sql(self, table):
+        key, columns = self.table_spec(table)
+        names = columns + [name for name, _, _, _ in DERIVED_COLUMNS[table]]
+        assignments = ", ".join(f"{name} = excluded.{name}" for name in names[1:])
+        current = ", ".join(f"{table}.{column}" for column in columns[1:])
+        incoming = ", ".join(f"excluded.{column}" for column in columns[1:])
+        return (f'{self.insert_sql(table)} ON CONFLICT ({key}) DO UPDATE SET {assignments} '
+                f'WHERE ({current}) IS NOT ({incoming})')
+
+    # Đếm số khoá đã có trong bảng
+    def count_existing(self, table, keys, chunk_size=500):
+        key, _ = self.table_spec(table)
+        count = 0
+        for chunk in iter_chunks(keys, chunk_size):
+            placeholders = ", ".join("?" * len(chunk))
+            count += self.conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {key} IN ({placeholders})',
+                                       chunk).fetchone()[0]
+        return count
+
+    # Gộp nhiều dòng vào bảng theo khoá (upsert) theo từng khối, tất cả trong một giao dịch
+    # Dữ liệu không có trong file được giữ nguyên, trả về số dòng (thêm, cập nhật, bỏ qua)
+    def merge(self, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        upsert_sql = self.upsert_sql(table)
+        inserted = updated = skipped = 0
+        with self.transaction():
+            for chunk in iter_chunks(rows, chunk_size):
+                keys = list({row[0] for row in chunk})
+                new_keys = len(keys) - self.count_existing(table, keys)
+                # rowcount chỉ tính các dòng được thêm hoặc thực sự được cập nhật
+                changed = self.conn.executemany(upsert_sql, [self.with_derived(table, row) for row in chunk]).rowcount
+                inserted += new_keys
+                updated += changed - new_keys
+                skipped += len(chunk) - changed
+                self.sync_loans(table, chunk)
+                self.relink_references(table, keys)
+                if progress:
+                    progress(inserted + updated + skipped)
+        return inserted, updated, skipped
+
+    # Thêm nhiều dòng theo từng khối bằng executemany, tất cả trong một giao dịch
+    # replace=True sẽ xoá dữ liệu cũ của bảng trước khi thêm; khi đó các trigger FTS được bỏ qua
+    # và chỉ mục toàn văn được dựng lại một lần ở cuối thay vì cập nhật theo từng dòng
+    # (các trigger được tạo lại trong cùng giao dịch, nên lỗi hoặc huỷ giữa chừng sẽ rollback cả hai)
+    def insert(self, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, replace=False, progress=None):
+        insert_sql = self.insert_sql(table)
+        count = 0
+        with self.transaction():
+            if replace:
+                # Câu INSERT mở giao dịch trước khi các trigger bị bỏ (DDL không tự mở giao dịch)
+                self.conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('delete-all')")
+                drop_search_triggers(self.conn, table)
+                self.conn.execute(f'DELETE FROM {table}')
+            for chunk in iter_chunks(rows, chunk_size):
+                self.conn.executemany(insert_sql, [self.with_derived(table, row) for row in chunk])
+                self.sync_loans(table, chunk)
+                self.relink_references(table, [row[0] for row in chunk])
+                count += len(chunk)
+                if progress:
+                    progress(count)
+            if replace:
+                self.conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+                create_search_triggers(self.conn, table)
+        return count
+
+    # Cập nhật nhiều dòng theo khoá, mỗi dòng gồm đầy đủ các cột (khoá đứng đầu)
+    def update(self, table, rows):
+        key, columns = self.table_spec(table)
+        rows = list(rows)
+        assignments = [f"{column} = ?" for column in columns[1:]]
+        assignments += [f"{name} = {expression}" for name, expression, _, _ in DERIVED_COLUMNS[table]]
+        with self.transaction():
+            cursor = self.conn.executemany(
+                f'UPDATE {table} SET {", ".join(assignments)} WHERE {key} = ?',
+                (self.with_derived(table, row)[1:] + (row[0],) for row in rows))
+            self.sync_loans(table, rows)
+            self.relink_references(table, [row[0] for row in rows])
+        return cursor.rowcount
+
+    # Đồng bộ các khoản mượn của những thành viên vừa được thêm/sửa bằng tay hoặc từ file CSV
+    # theo cột books_borrowed (mỗi tên sách là một khoản mượn)
+    # Chỉ phần chênh lệch (theo số lần xuất hiện của từng tên sách) được thêm/xoá: khoản mượn gắn với
+    # giao dịch mượn (transaction_ref) được giữ lại, chỉ khoản mượn không có giao dịch mới bị xoá
+    def sync_loans(self, table, rows, chunk_size=500):
+        if table != "members":
+            return
+        removed, added = [], []
+        for chunk in iter_chunks(rows, chunk_size):
+            keys = [row[0] for row in chunk]
+            placeholders = ", ".join("?" * len(keys))
+            current = {}
+            # Khoản mượn có giao dịch đứng trước nên được khớp với danh sách mới trước
+            for member_id, loan_id, title, linked in self.conn.execute(
+                    f'SELECT m.member_id, l.id, l.title, l.transaction_ref IS NOT NULL FROM members m '
+                    f'JOIN loans l ON l.member_ref = m.id WHERE m.member_id IN ({placeholders}) '
+                    f'ORDER BY l.transaction_ref IS NULL, l.id', keys):
+                current.setdefault(member_id, []).append((loan_id, title, linked))
+            for row in chunk:
+                wanted = Counter(split_titles(row[3]))
+                for loan_id, title, linked in current.get(row[0], []):
+                    if wanted[title] > 0:
+                        wanted[title] -= 1
+                    elif not linked:
+                        removed.append((loan_id,))
+                added.extend((row[0], title, title) for title in wanted.elements())
+        self.conn.executemany('DELETE FROM loans WHERE id = ?', removed)
+        self.conn.executemany('INSERT INTO loans (member_ref, book_ref, title) VALUES '
+                              '((SELECT id FROM members WHERE member_id = ?), (SELECT id FROM books WHERE title = ?), ?)',
+                              added)
+
+    # Gắn lại khoá ngoại của các giao dịch và khoản mượn chưa tìm thấy sách/thành viên
+    # (ví dụ khi giao dịch được nhập trước sách hoặc thành viên)
+    # Chỉ xét các dòng trỏ tới những khoá vừa được ghi (dùng chỉ mục book_id, member_id, loans.title),
+    # không quét lại cả bảng ở mỗi lần ghi
+    def relink_references(self, table, keys):
+        params = [(key,) for key in keys]
+        if table == "books":
+            self.conn.executemany('UPDATE transactions SET book_ref = (SELECT id FROM books WHERE title = ?1) '
+                                  'WHERE book_id = ?1 AND book_ref IS NULL', params)
+            self.conn.executemany('UPDATE loans SET book_ref = (SELECT id FROM books WHERE title = ?1) '
+                                  'WHERE title = ?1 AND book_ref IS NULL', params)
+        elif table == "members":
+            self.conn.executemany('UPDATE transactions SET member_ref = (SELECT id FROM members WHERE member_id = ?1) '
+                                  'WHERE member_id = ?1 AND member_ref IS NULL', params)
+
+    # Xoá nhiều dòng theo danh sách khoá
+    def delete(self, table, keys):
+        key, _ = self.table_spec(table)
+        with self.transaction():
+            cursor = self.conn.executemany(f'DELETE FROM {table} WHERE {key} = ?', ((k,) for k in keys))
+        return cursor.rowcount
+
+    # Các sách thành viên đang mượn kèm giao dịch mượn (nếu có), dùng chỉ mục loans.member_ref
+    def loans_for_member(self, member_id):
+        return self.conn.execute(
+            'SELECT l.title, t.transaction_id, t.borrow_date, t.return_date FROM members m '
+            'JOIN loans l ON l.member_ref = m.id LEFT JOIN transactions t ON t.id = l.transaction_ref '
+            'WHERE m.member_id = ? ORDER BY l.id', (member_id,)).fetchall()
+
+    # Các thành viên đang mượn một cuốn sách, dùng chỉ mục loans.book_ref
+    def loans_for_book(self, title):
+        return self.conn.execute(
+            'SELECT m.member_id, m.name, t.transaction_id, t.return_date FROM books b '
+            'JOIN loans l ON l.book_ref = b.id JOIN members m ON m.id = l.member_ref '
+            'LEFT JOIN transactions t ON t.id = l.transaction_ref WHERE b.title = ? ORDER BY l.id', (title,)).fetchall()
+
+    # Các giao dịch quá hạn: còn khoản mượn trong loans (sách chưa trả) và hạn trả (ISO-8601) trước ngày as_of,
+    # hạn sớm nhất trước. Lịch sử giao dịch nhập từ CSV không có khoản mượn nên không bị tính là quá hạn
+    # Duyệt đoạn chỉ mục idx_loans_due_date của những khoản đã quá hạn rồi tra giao dịch theo khoá chính,
+    # mỗi dòng bắt đầu bằng rowid và kết thúc bằng hạn trả ISO
+    def overdue(self, as_of, limit=SEARCH_LIMIT):
+        columns = ", ".join(f"t.{column}" for column in self.table_spec("transactions")[1])
+        return self.conn.execute(
+            f'SELECT t.rowid, {columns}, l.due_date_iso FROM loans l CROSS JOIN transactions t '
+            'ON t.id = l.transaction_ref WHERE l.due_date_iso < ? ORDER BY l.due_date_iso LIMIT ?',
+            (as_of, limit)).fetchall()
+
+    def count_overdue(self, as_of):
+        return self.conn.execute('SELECT COUNT(*) FROM loans WHERE due_date_iso < ?', (as_of,)).fetchone()[0]
+
+    # Trong các rowid cho trước (ví dụ các dòng đang hiển thị), những giao dịch nào đang quá hạn
+    # (dùng chỉ mục loans.transaction_ref)
+    def overdue_among(self, rowids, as_of):
+        placeholders = ", ".join("?" * len(rowids))
+        return {rowid for (rowid,) in self.conn.execute(
+            f'SELECT transaction_ref FROM loans WHERE transaction_ref IN ({placeholders}) AND due_date_iso < ?',
+            list(rowids) + [as_of])}
+
+    # Số liệu thống kê đọc từ các bảng tổng hợp (được trigger cập nhật), không quét bảng dữ liệu
+    # Trả về (tổng số, thống kê theo thể loại, các sách được mượn nhiều nhất)
+    def statistics(self, top=10):
+        # File cũ chỉ chứa một phần các bảng có thể thiếu dòng tổng; coi như chưa có dữ liệu
+        totals = self.conn.execute('SELECT titles, copies, available, members, transactions, open_loans '
+                                   'FROM library_totals WHERE id = 1').fetchone() or (0, 0, 0, 0, 0, 0)
+        genres = self.conn.execute('SELECT genre, titles, copies, available, loans FROM genre_stats '
+                                   'WHERE titles > 0 ORDER BY loans DESC, genre').fetchall()
+        top_titles = self.conn.execute('SELECT book_id, loans FROM book_loan_counts WHERE loans > 0 '
+                                       'ORDER BY loans DESC LIMIT ?', (top,)).fetchall()
+        return totals, genres, top_titles
+
+    # Cài đặt giao diện đã lưu (khoá -> giá trị dạng chuỗi)
+    def load_settings(self):
+        return dict(self.conn.execute('SELECT key, value FROM settings'))
+
+    def save_settings(self, settings):
+        with self.transaction():
+            self.conn.executemany('INSERT INTO settings (key, value) VALUES (?, ?) '
+                                  'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                                  [(key, str(value)) for key, value in settings.items()])
+
+    # Tất cả giao dịch của một thành viên (dùng chỉ mục member_id)
+    def transactions_for_member(self, member_id):
+        return self.conn.execute(
+            f'SELECT {self.columns("transactions")} FROM transactions WHERE member_id = ? ORDER BY rowid',
+            (member_id,)).fetchall()
+
+    # Các giao dịch có hạn trả trước ngày (ISO-8601) cho trước (dùng chỉ mục return_date_iso)
+    def transactions_due_before(self, iso_date):
+        return self.conn.execute(
+            f'SELECT {self.columns("transactions")} FROM transactions '
+            'WHERE return_date_iso < ? ORDER BY return_date_iso', (iso_date,)).fetchall()
+
+    # Xoá toàn bộ dữ liệu của bảng
+    def reset(self, table):
+        self.table_spec(table)
+        with self.transaction():
+            self.conn.execute(f'DELETE FROM {table}')
@@ -0,0 +1,433 @@
+from datetime import datetime
+
+# Phiên bản hiện tại của lược đồ cơ sở dữ liệu (lưu trong PRAGMA user_version)
+SCHEMA_VERSION = 10
+
+# Các định dạng ngày được chấp nhận (ví dụ 13/06/2019 hoặc 2019-06-13)
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d"]
+
+# Các cột được đánh chỉ mục toàn văn (FTS5) của từng bảng
+SEARCH_COLUMNS = {
+    "books": ["title", "author", "genre"],
+    "members": ["member_id", "name"],
+    "transactions": ["transaction_id", "book_id", "member_id"],
+}
+
+
+# Chuyển ngày dạng d/m/Y sang ISO-8601 (YYYY-MM-DD), trả về None nếu không hợp lệ
+def to_iso_date(value):
+    if not value:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+# Danh sách sách đang mượn trong cột books_borrowed được lưu dạng "Tên 1, Tên 2"
+def split_titles(text):
+    return [title.strip() for title in (text or "").split(",") if title.strip()]
+
+
+# Phiên bản 1: lược đồ ban đầu (khoá chính dạng TEXT, ngày lưu dạng chuỗi tự do)
+def create_legacy_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            title TEXT PRIMARY KEY,
+            author TEXT,
+            genre TEXT,
+            quantity INTEGER,
+            available INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS members (
+            member_id TEXT PRIMARY KEY,
+            name TEXT,
+            membership_date TEXT,
+            books_borrowed TEXT,
+            quantity_borrowed INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id TEXT PRIMARY KEY,
+            book_id TEXT,
+            member_id TEXT,
+            borrow_date TEXT,
+            return_date TEXT
+        )
+    ''')
+
+
+# Phiên bản 2: khoá nguyên (rowid), cột ngày ISO-8601, khoá ngoại và chỉ mục
+# Dữ liệu cũ được chép sang bảng mới, giữ nguyên rowid để thứ tự hiển thị không đổi
+def add_integer_keys_and_dates(conn):
+    conn.create_function("iso_date", 1, to_iso_date, deterministic=True)
+    conn.execute('''
+        CREATE TABLE books_new (
+            id INTEGER PRIMARY KEY,
+            title TEXT UNIQUE,
+            author TEXT,
+            genre TEXT,
+            quantity INTEGER,
+            available INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE members_new (
+            id INTEGER PRIMARY KEY,
+            member_id TEXT UNIQUE,
+            name TEXT,
+            membership_date TEXT,
+            books_borrowed TEXT,
+            quantity_borrowed INTEGER,
+            membership_date_iso TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY,
+            transaction_id TEXT UNIQUE,
+            book_id TEXT,
+            member_id TEXT,
+            borrow_date TEXT,
+            return_date TEXT,
+            borrow_date_iso TEXT,
+            return_date_iso TEXT,
+            book_ref INTEGER REFERENCES books(id) ON DELETE SET NULL,
+            member_ref INTEGER REFERENCES members(id) ON DELETE SET NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO books_new (id, title, author, genre, quantity, available)
+        SELECT rowid, title, author, genre, quantity, available FROM books
+    ''')
+    conn.execute('''
+        INSERT INTO members_new (id, member_id, name, membership_date, books_borrowed, quantity_borrowed,
+                                 membership_date_iso)
+        SELECT rowid, member_id, name, membership_date, books_borrowed, quantity_borrowed,
+               iso_date(membership_date)
+        FROM members
+    ''')
+    conn.execute('''
+        INSERT INTO transactions_new (id, transaction_id, book_id, member_id, borrow_date, return_date,
+                                      borrow_date_iso, return_date_iso, book_ref, member_ref)
+        SELECT t.rowid, t.transaction_id, t.book_id, t.member_id, t.borrow_date, t.return_date,
+               iso_date(t.borrow_date), iso_date(t.return_date),
+               (SELECT b.id FROM books_new b WHERE b.title = t.book_id),
+               (SELECT m.id FROM members_new m WHERE m.member_id = t.member_id)
+        FROM transactions t
+    ''')
+    for table in ("books", "members", "transactions"):
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    conn.execute('CREATE INDEX idx_transactions_member_ref ON transactions (member_ref)')
+    conn.execute('CREATE INDEX idx_transactions_book_ref ON transactions (book_ref)')
+    conn.execute('CREATE INDEX idx_transactions_member_id ON transactions (member_id)')
+    conn.execute('CREATE INDEX idx_transactions_book_id ON transactions (book_id)')
+    conn.execute('CREATE INDEX idx_transactions_borrow_date ON transactions (borrow_date_iso)')
+    conn.execute('CREATE INDEX idx_transactions_return_date ON transactions (return_date_iso)')
+
+
+# Các trigger giữ chỉ mục toàn văn của bảng đồng bộ khi thêm/sửa/xoá
+def create_search_triggers(conn, table):
+    columns = SEARCH_COLUMNS[table]
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    conn.execute(f'''
+        CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts (rowid, {names}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {table}_fts_update AFTER UPDATE OF {names} ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table}_fts (rowid, {names}) VALUES (new.id, {new_values});
+        END
+    ''')
+
+
+# Bỏ các trigger trên khi nạp lại cả bảng (chỉ mục được dựng lại một lần bằng 'rebuild')
+def drop_search_triggers(conn, table):
+    for action in ("insert", "delete", "update"):
+        conn.execute(f'DROP TRIGGER {table}_fts_{action}')
+
+
+# Phiên bản 3: chỉ mục toàn văn FTS5 cho từng bảng
+# Bảng FTS dạng external content (không lưu lại nội dung), được đồng bộ bằng trigger khi thêm/sửa/xoá
+# prefix='2 3' giúp tìm theo tiền tố (khi đang gõ) không phải quét toàn bộ từ điển
+def add_search_indexes(conn):
+    for table, columns in SEARCH_COLUMNS.items():
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE {table}_fts USING fts5(
+                {", ".join(columns)},
+                content='{table}',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+        create_search_triggers(conn, table)
+        # Đánh chỉ mục cho dữ liệu đã có
+        conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+# Phiên bản 4: ngày trả thực tế của giao dịch mượn (NULL: sách chưa được trả)
+# Cột return_date vẫn là hạn trả do người dùng nhập
+def add_returned_on(conn):
+    conn.execute('ALTER TABLE transactions ADD COLUMN returned_on TEXT')
+
+
+# Phiên bản 5: bảng loans, mỗi dòng là một cuốn sách thành viên đang mượn
+# Thay cho việc tách chuỗi books_borrowed, tra cứu theo thành viên hoặc theo sách dùng chỉ mục
+# books_borrowed và quantity_borrowed được giữ lại làm cột tóm tắt để hiển thị
+def add_loans(conn):
+    conn.execute('''
+        CREATE TABLE loans (
+            id INTEGER PRIMARY KEY,
+            member_ref INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+            book_ref INTEGER REFERENCES books(id) ON DELETE SET NULL,
+            title TEXT NOT NULL,
+            transaction_ref INTEGER REFERENCES transactions(id) ON DELETE SET NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_loans_member_ref ON loans (member_ref)')
+    conn.execute('CREATE INDEX idx_loans_book_ref ON loans (book_ref)')
+    conn.execute('CREATE INDEX idx_loans_transaction_ref ON loans (transaction_ref)')
+    # Mỗi tên sách trong books_borrowed trở thành một khoản mượn
+    members = conn.execute('SELECT id, books_borrowed FROM members')
+    conn.executemany('INSERT INTO loans (member_ref, book_ref, title) '
+                     'VALUES (?, (SELECT id FROM books WHERE title = ?), ?)',
+                     ((member_ref, title, title) for member_ref, text in members for title in split_titles(text)))
+
+
+# Câu lệnh cộng (sign=1) hoặc trừ (sign=-1) một cuốn sách (row: "new" hoặc "old") vào thống kê theo thể loại
+# Số lượt mượn của thể loại là tổng lượt mượn của các sách đang thuộc thể loại đó
+def genre_stats_sql(row, sign):
+    return f'''
+        INSERT INTO genre_stats (genre, titles, copies, available, loans)
+        VALUES (COALESCE({row}.genre, ''), {sign}, {sign} * COALESCE({row}.quantity, 0),
+                {sign} * COALESCE({row}.available, 0),
+                {sign} * COALESCE((SELECT loans FROM book_loan_counts WHERE book_id = {row}.title), 0))
+        ON CONFLICT (genre) DO UPDATE SET
+            titles = titles + excluded.titles,
+            copies = copies + excluded.copies,
+            available = available + excluded.available,
+            loans = loans + excluded.loans;
+        UPDATE library_totals SET
+            titles = titles + {sign},
+            copies = copies + {sign} * COALESCE({row}.quantity, 0),
+            available = available + {sign} * COALESCE({row}.available, 0);
+    '''
+
+
+# Câu lệnh cộng/trừ một lượt mượn (giao dịch) vào thống kê theo sách và theo thể loại của sách
+def loan_stats_sql(row, sign):
+    return f'''
+        INSERT INTO book_loan_counts (book_id, loans) VALUES (COALESCE({row}.book_id, ''), {sign})
+        ON CONFLICT (book_id) DO UPDATE SET loans = loans + excluded.loans;
+        UPDATE genre_stats SET loans = loans + {sign}
+        WHERE genre = (SELECT COALESCE(genre, '') FROM books WHERE title = {row}.book_id);
+        UPDATE library_totals SET transactions = transactions + {sign};
+    '''
+
+
+# Tính lại toàn bộ các bảng tổng hợp từ dữ liệu của schema cho trước
+# (main, hoặc file đích đã ATTACH khi chỉ xuất một số bảng)
+def seed_statistics(conn, schema="main"):
+    for table in ("book_loan_counts", "genre_stats", "library_totals"):
+        conn.execute(f'DELETE FROM {schema}.{table}')
+    conn.execute(f'''
+        INSERT INTO {schema}.book_loan_counts (book_id, loans)
+        SELECT COALESCE(book_id, ''), COUNT(*) FROM {schema}.transactions GROUP BY COALESCE(book_id, '')
+    ''')
+    conn.execute(f'''
+        INSERT INTO {schema}.genre_stats (genre, titles, copies, available, loans)
+        SELECT COALESCE(b.genre, ''), COUNT(*), SUM(COALESCE(b.quantity, 0)), SUM(COALESCE(b.available, 0)),
+               SUM(COALESCE(c.loans, 0))
+        FROM {schema}.books b LEFT JOIN {schema}.book_loan_counts c ON c.book_id = b.title
+        GROUP BY COALESCE(b.genre, '')
+    ''')
+    conn.execute(f'''
+        INSERT INTO {schema}.library_totals (id, titles, copies, available, members, transactions, open_loans)
+        SELECT 1,
+               (SELECT COUNT(*) FROM {schema}.books),
+               (SELECT COALESCE(SUM(quantity), 0) FROM {schema}.books),
+               (SELECT COALESCE(SUM(available), 0) FROM {schema}.books),
+               (SELECT COUNT(*) FROM {schema}.members),
+               (SELECT COUNT(*) FROM {schema}.transactions),
+               (SELECT COUNT(*) FROM {schema}.loans)
+    ''')
+
+
+# Phiên bản 6: các bảng thống kê được trigger cập nhật dần khi sách, thành viên, giao dịch thay đổi
+# Màn hình thống kê chỉ đọc các bảng nhỏ này thay vì quét toàn bộ sách và lịch sử giao dịch
+def add_statistics(conn):
+    conn.execute('''
+        CREATE TABLE genre_stats (
+            genre TEXT PRIMARY KEY,
+            titles INTEGER NOT NULL DEFAULT 0,
+            copies INTEGER NOT NULL DEFAULT 0,
+            available INTEGER NOT NULL DEFAULT 0,
+            loans INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE book_loan_counts (
+            book_id TEXT PRIMARY KEY,
+            loans INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_book_loan_counts_loans ON book_loan_counts (loans)')
+    conn.execute('''
+        CREATE TABLE library_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            titles INTEGER NOT NULL DEFAULT 0,
+            copies INTEGER NOT NULL DEFAULT 0,
+            available INTEGER NOT NULL DEFAULT 0,
+            members INTEGER NOT NULL DEFAULT 0,
+            transactions INTEGER NOT NULL DEFAULT 0,
+            open_loans INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Số liệu ban đầu được tính một lần từ dữ liệu hiện có
+    seed_statistics(conn)
+    conn.execute(f'''
+        CREATE TRIGGER books_stats_insert AFTER INSERT ON books BEGIN
+            {genre_stats_sql("new", 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER books_stats_delete AFTER DELETE ON books BEGIN
+            {genre_stats_sql("old", -1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER books_stats_update AFTER UPDATE OF title, genre, quantity, available ON books BEGIN
+            {genre_stats_sql("old", -1)}
+            {genre_stats_sql("new", 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER transactions_stats_insert AFTER INSERT ON transactions BEGIN
+            {loan_stats_sql("new", 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER transactions_stats_delete AFTER DELETE ON transactions BEGIN
+            {loan_stats_sql("old", -1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER transactions_stats_update AFTER UPDATE OF book_id ON transactions BEGIN
+            {loan_stats_sql("old", -1)}
+            {loan_stats_sql("new", 1)}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER members_stats_insert AFTER INSERT ON members BEGIN
+            UPDATE library_totals SET members = members + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER members_stats_delete AFTER DELETE ON members BEGIN
+            UPDATE library_totals SET members = members - 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER loans_stats_insert AFTER INSERT ON loans BEGIN
+            UPDATE library_totals SET open_loans = open_loans + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER loans_stats_delete AFTER DELETE ON loans BEGIN
+            UPDATE library_totals SET open_loans = open_loans - 1;
+        END
+    ''')
+
+
+# Phiên bản 7: hạn trả của khoản mượn (chép từ giao dịch mượn) kèm chỉ mục trên bảng loans
+# Bảng loans chỉ chứa sách chưa trả, nên tìm khoản mượn quá hạn chỉ duyệt đoạn chỉ mục
+# của những khoản thực sự quá hạn; lịch sử giao dịch nhập từ CSV không có khoản mượn
+def add_loan_due_dates(conn):
+    conn.execute('ALTER TABLE loans ADD COLUMN due_date_iso TEXT')
+    conn.execute('UPDATE loans SET due_date_iso = (SELECT return_date_iso FROM transactions '
+                 'WHERE id = loans.transaction_ref) WHERE transaction_ref IS NOT NULL')
+    conn.execute('CREATE INDEX idx_loans_due_date ON loans (due_date_iso)')
+    # Sửa hạn trả của giao dịch thì hạn trả của khoản mượn đi theo
+    conn.execute('''
+        CREATE TRIGGER transactions_due_date_update AFTER UPDATE OF return_date_iso ON transactions BEGIN
+            UPDATE loans SET due_date_iso = new.return_date_iso WHERE transaction_ref = new.id;
+        END
+    ''')
+
+
+# Phiên bản 8: bảng cài đặt giao diện (màu nền, phông chữ) dạng khoá - giá trị, được áp dụng khi khởi động
+def add_settings(conn):
+    conn.execute('CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+
+# Phiên bản 9: chỉ mục cho các cột có thể sắp xếp/lọc trên giao diện (xem SORT_COLUMNS trong library_repository)
+# Các cột khoá và các cột của bảng transactions đã có chỉ mục từ phiên bản 2
+def add_sort_indexes(conn):
+    for table, column in [("books", "author"), ("books", "genre"), ("books", "quantity"), ("books", "available"),
+                          ("members", "name"), ("members", "membership_date_iso"),
+                          ("members", "quantity_borrowed")]:
+        conn.execute(f'CREATE INDEX idx_{table}_{column} ON {table} ({column})')
+
+
+# Phiên bản 10: chỉ mục theo tên sách của khoản mượn, để khi thêm sách chỉ gắn lại các khoản mượn cùng tên
+def add_loan_title_index(conn):
+    conn.execute('CREATE INDEX idx_loans_title ON loans (title)')
+
+
+# Danh sách các bước nâng cấp: (phiên bản đích, hàm thực hiện)
+MIGRATIONS = [
+    (1, create_legacy_tables),
+    (2, add_integer_keys_and_dates),
+    (3, add_search_indexes),
+    (4, add_returned_on),
+    (5, add_loans),
+    (6, add_statistics),
+    (7, add_loan_due_dates),
+    (8, add_settings),
+    (9, add_sort_indexes),
+    (10, add_loan_title_index),
+]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+# Nâng cấp file cơ sở dữ liệu lên phiên bản mới nhất ngay tại chỗ
+# Tất cả các bước chạy trong một giao dịch, lỗi ở bất kỳ bước nào sẽ rollback toàn bộ
+def migrate(conn):
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    # Khoá ngoại phải tắt trong lúc dựng lại bảng (không đổi được bên trong giao dịch)
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        conn.execute('BEGIN')
+        try:
+            for target, step in MIGRATIONS:
+                if target > version:
+                    step(conn)
+                    conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+    return schema_version(conn)
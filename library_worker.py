@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+
+from library_repository import DEFAULT_PROFILE, LibraryRepository
+
+
+# Lỗi được ném ra khi tác vụ bị người dùng huỷ
+class JobCancelled(Exception):
+    pass
+
+
+# Một tác vụ gửi cho luồng cơ sở dữ liệu
+# func được gọi dạng func(repo, job, *args) trên luồng nền
+# group=True: tác vụ ghi ngắn, có thể được gom commit chung với các tác vụ liền kề
+class Job:
+    def __init__(self, worker, func, args, on_done=None, on_error=None, on_progress=None, group=False):
+        self.worker = worker
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.group = group
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    # Báo tiến độ về luồng giao diện, đồng thời là điểm dừng khi tác vụ bị huỷ
+    def report(self, done, total=None):
+        if self.cancelled:
+            raise JobCancelled("Operation cancelled")
+        if self.on_progress:
+            self.worker.results.put(("progress", self, (done, total)))
+
+
+# Luồng nền thực hiện mọi thao tác với cơ sở dữ liệu theo thứ tự trong hàng đợi
+# Kết quả được chuyển về luồng giao diện qua hàm schedule (ví dụ root.after)
+# group_commit_ms > 0: các tác vụ group liền nhau trong khoảng thời gian này được commit chung một lần,
+# kết quả của chúng chỉ được báo về sau khi commit thành công
+class DatabaseWorker:
+    def __init__(self, path, schedule, poll_ms=50, profile=DEFAULT_PROFILE, group_commit_ms=0):
+        self.path = path
+        self.schedule = schedule
+        self.poll_ms = poll_ms
+        self.profile = profile
+        self.group_commit_ms = group_commit_ms
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="library-db", daemon=True)
+        self.thread.start()
+        self.schedule(self.poll_ms, self.poll)
+
+    # Đưa một tác vụ vào hàng đợi, trả về Job để theo dõi hoặc huỷ
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, group=False):
+        job = Job(self, func, args, on_done, on_error, on_progress, group)
+        self.jobs.put(job)
+        return job
+
+    # Vòng lặp của luồng nền, kết nối SQLite chỉ được dùng trong luồng này
+    def run(self):
+        repo = LibraryRepository.open(self.path, self.profile)
+        # Kết quả của các tác vụ đã chạy trong giao dịch chung, chờ commit: [(loại, job, giá trị)]
+        group = []
+        deadline = 0
+        try:
+            while True:
+                try:
+                    job = self.jobs.get(timeout=max(0, deadline - time.monotonic()) if repo.grouping else None)
+                except queue.Empty:
+                    # Hết thời gian gom: commit nhóm hiện tại
+                    self.commit_group(repo, group)
+                    group = []
+                    continue
+                if repo.grouping and (job is None or not job.group):
+                    self.commit_group(repo, group)
+                    group = []
+                if job is None:
+                    break
+                if job.group and self.group_commit_ms > 0:
+                    try:
+                        # BEGIN IMMEDIATE báo "database is locked" nếu kết nối khác (ví dụ lệnh nhập từ CLI)
+                        # giữ khoá ghi lâu hơn BUSY_TIMEOUT: tác vụ nhận lỗi, luồng nền vẫn tiếp tục chạy
+                        if not repo.grouping:
+                            repo.begin_group()
+                            deadline = time.monotonic() + self.group_commit_ms / 1000
+                        if job.cancelled:
+                            raise JobCancelled("Operation cancelled")
+                        group.append(("done", job, job.func(repo, job, *job.args)))
+                    except Exception as e:
+                        if repo.grouping:
+                            group.append(("error", job, e))
+                        else:
+                            self.results.put(("error", job, e))
+                    continue
+                try:
+                    if job.cancelled:
+                        raise JobCancelled("Operation cancelled")
+                    self.results.put(("done", job, job.func(repo, job, *job.args)))
+                except Exception as e:
+                    self.results.put(("error", job, e))
+        finally:
+            repo.close()
+
+    # Commit giao dịch chung rồi báo kết quả của các tác vụ trong nhóm theo đúng thứ tự
+    # Nếu commit lỗi thì toàn bộ nhóm bị rollback và mọi tác vụ trong nhóm nhận lỗi
+    def commit_group(self, repo, group):
+        try:
+            repo.end_group()
+        except Exception as e:
+            repo.end_group(commit=False)
+            group = [("error", job, e) for _, job, _ in group]
+        for result in group:
+            self.results.put(result)
+
+    # Chạy trên luồng giao diện: gọi các callback của những tác vụ đã xong
+    def poll(self):
+        # Lỗi trong một callback vẫn được Tk báo ra như bình thường, nhưng lịch kiểm tra
+        # phải được đặt lại, nếu không các kết quả sau sẽ không bao giờ được xử lý
+        try:
+            while True:
+                try:
+                    kind, job, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    job.on_progress(*value)
+                elif kind == "done" and job.on_done:
+                    job.on_done(value)
+                elif kind == "error" and job.on_error:
+                    job.on_error(value)
+        finally:
+            if not self.closed:
+                self.schedule(self.poll_ms, self.poll)
+
+    # Dừng luồng nền sau khi các tác vụ đang chờ được thực hiện xong
+    def close(self, timeout=None):
+        self.closed = True
+        self.jobs.put(None)
+        self.thread.join(timeout)